@@ -0,0 +1,57 @@
+# description: profiling harness; reports what one Closeform.random() call allocates: the expression
+#              objects it constructs and its peak traced memory
+#              run from the repository root: python benchmarks/allocations.py [calls]
+
+import os, random, sys, time, tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import mpgExpressions
+
+def count_constructions(calls, seed=0):
+    """Returns the mean number of Expression objects constructed per Closeform.random() call"""
+    constructed = 0
+    original = mpgExpressions.Expression.__init__
+
+    def counting_init(self, *args, **kwargs):
+        nonlocal constructed
+        constructed += 1
+        original(self, *args, **kwargs)
+
+    expression = mpgExpressions.Closeform(rng=random.Random(seed))
+    mpgExpressions.Expression.__init__ = counting_init
+    try:
+        for _ in range(calls):
+            expression.random()
+    finally:
+        mpgExpressions.Expression.__init__ = original
+    return constructed / calls
+
+def traced_memory(calls, seed=0):
+    """Returns the mean peak traced memory (bytes) per Closeform.random() call"""
+    expression = mpgExpressions.Closeform(rng=random.Random(seed))
+    expression.random() # warm the sampler caches
+    peaks = 0
+    tracemalloc.start()
+    for _ in range(calls):
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        expression.random()
+        peaks += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return peaks / calls
+
+def main(calls=20000):
+    expression = mpgExpressions.Closeform(rng=random.Random(0))
+    start = time.perf_counter()
+    for _ in range(calls):
+        expression.random()
+    elapsed = time.perf_counter() - start
+
+    peak = traced_memory(calls // 4)
+    print(f"Closeform.random() x {calls}")
+    print(f"  expression objects constructed per call: {count_constructions(calls):.2f}")
+    print(f"  peak traced memory per call: {peak:.0f} B")
+    print(f"  time per call: {elapsed / calls * 1e6:.1f} us")
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,50 @@
+# description: benchmark definitions for the expression generators; each benchmark maps a setup
+#              function, which returns the zero-argument call to time, to the parameters it sweeps
+
+import random
+
+import main
+import mpgExpressions
+
+DEGREES = tuple(range(1, 11))
+INDETS = ('x', 'xy', 'xyz', 'wxyz', 'uvwxyz', 'stuvwxyz')
+BOUNDS = ((-10, 10), (-100, 100), (-1000, 1000))
+EXPRESSIONS = ('Polynomial', 'Algebraic', 'Closeform')
+
+# the reduced sweep used by --quick
+QUICK = {
+    'degree': (1, 3, 5, 10),
+    'indets': ('x', 'wxyz', 'stuvwxyz'),
+    'bounds': ((-10, 10), (-1000, 1000)),
+}
+
+def get_coefficients(degree, bounds):
+    expression = mpgExpressions.Expression(rng=random.Random(0))
+    return lambda : expression.get_coefficients(degree, *bounds)
+
+def polynomial_new(degree, indets, bounds):
+    return mpgExpressions.Polynomial(degree, indets, *bounds, rng=random.Random(0)).new
+
+def algebraic_new(degree, indets):
+    return mpgExpressions.Algebraic(degree, indets, root=3, rng=random.Random(0)).new
+
+def closeform_new(degree, indets):
+    return mpgExpressions.Closeform(degree, indets, log=True, expo=True, algebraic=(3, True, True),
+                                    rng=random.Random(0)).new
+
+def expression_random(expression):
+    return getattr(mpgExpressions, expression)(rng=random.Random(0)).random
+
+def problem_generator(expression):
+    # one problem per call, pulled through the seeded streaming pipeline
+    stream = main.problem_generator(getattr(mpgExpressions, expression), None, randomize=True, seed=0)
+    return lambda : next(stream)
+
+BENCHMARKS = {
+    'get_coefficients': (get_coefficients, {'degree': DEGREES, 'bounds': BOUNDS}),
+    'Polynomial.new': (polynomial_new, {'degree': DEGREES, 'indets': INDETS, 'bounds': BOUNDS}),
+    'Algebraic.new': (algebraic_new, {'degree': DEGREES, 'indets': INDETS}),
+    'Closeform.new': (closeform_new, {'degree': DEGREES, 'indets': INDETS}),
+    'random': (expression_random, {'expression': EXPRESSIONS}),
+    'problem_generator': (problem_generator, {'expression': EXPRESSIONS}),
+}
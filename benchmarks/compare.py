@@ -0,0 +1,45 @@
+# description: compares two benchmark results files from run.py and reports regressions; exits
+#              with status 1 if any case got slower (median latency) by more than the threshold
+#              run from the repository root: python benchmarks/compare.py BASELINE.json NEW.json
+
+import argparse, json, sys
+
+def load(path):
+    with open(path) as file:
+        data = json.load(file)
+    return data, {(r['benchmark'], json.dumps(r['params'], sort_keys=True)): r for r in data['results']}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compares two benchmark results files")
+    parser.add_argument('baseline')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=0.10, help="allowed slowdown, as a fraction")
+    parser.add_argument('--all', action='store_true', help="list every case, not just the changed ones")
+    args = parser.parse_args(argv)
+
+    old_data, old = load(args.baseline)
+    new_data, new = load(args.new)
+    print(f"{old_data['commit']} -> {new_data['commit']}")
+
+    regressions = 0
+    for key in sorted(old.keys() & new.keys()):
+        before, after = old[key]['latency_us']['p50'], new[key]['latency_us']['p50']
+        change = after / before - 1 if before else 0.0
+        memory = new[key]['peak_memory_bytes'] - old[key]['peak_memory_bytes']
+        flag = ''
+        if change > args.threshold:
+            flag = 'REGRESSION'
+            regressions += 1
+        elif change < -args.threshold:
+            flag = 'improved'
+        if flag or args.all:
+            print(f"{key[0]:<18} {key[1]:<55} p50 {before:>8.1f}us -> {after:>8.1f}us ({change:+.0%})  "
+                  f"peak {memory:+}B  {flag}")
+
+    for key in sorted(old.keys() ^ new.keys()):
+        print(f"{key[0]:<18} {key[1]:<55} only in {'baseline' if key in old else 'new'}")
+    print(f"{regressions} regression(s) over {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+# description: runs the generator benchmarks and saves machine-readable results; for each benchmark
+#              and parameter combination it records throughput (calls/sec), per-call latency
+#              percentiles and peak traced memory
+#              run from the repository root: python benchmarks/run.py [--quick] [--output FILE]
+
+import argparse, datetime, itertools, json, os, platform, re, subprocess, sys, time, tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_generators import BENCHMARKS, QUICK
+
+def percentile(ordered, fraction):
+    """Returns a percentile of a sorted list, by nearest rank"""
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def measure(call, budget, min_calls=20, memory_calls=200):
+    """Times call until the budget (seconds) is spent, then traces its peak memory"""
+    for _ in range(min_calls): # warm up caches
+        call()
+
+    latencies = []
+    clock = time.perf_counter_ns
+    deadline = clock() + int(budget * 1e9)
+    while len(latencies) < min_calls or clock() < deadline:
+        start = clock()
+        call()
+        latencies.append(clock() - start)
+    total = sum(latencies)
+    latencies.sort()
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    for _ in range(memory_calls):
+        call()
+    peak = tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+
+    return {
+        'calls': len(latencies),
+        'throughput': len(latencies) / (total / 1e9),
+        'latency_us': {name: percentile(latencies, q) / 1e3 for name, q in
+                       (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('max', 1.0))},
+        'peak_memory_bytes': peak,
+    }
+
+def cases(quick=False, pattern=None):
+    """A generator; yields (benchmark name, params) for every benchmark and parameter combination"""
+    for name, (_, sweep) in BENCHMARKS.items():
+        if pattern and not re.search(pattern, name):
+            continue
+        if quick:
+            sweep = {k: QUICK.get(k, v) for k, v in sweep.items()}
+        for values in itertools.product(*sweep.values()):
+            yield name, dict(zip(sweep, values))
+
+def commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks the expression generators")
+    parser.add_argument('--quick', action='store_true', help="sweep a reduced set of parameters")
+    parser.add_argument('--filter', help="only run benchmarks whose name matches this regex")
+    parser.add_argument('--budget', type=float, default=0.2, help="seconds spent timing each case")
+    parser.add_argument('--output', help="results file (default: benchmarks/results/<commit>.json)")
+    args = parser.parse_args(argv)
+
+    results = {
+        'commit': commit(),
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'machine': platform.platform(),
+        'budget': args.budget,
+        'results': [],
+    }
+    for name, params in cases(args.quick, args.filter):
+        setup = BENCHMARKS[name][0]
+        result = measure(setup(**params), args.budget)
+        results['results'].append({'benchmark': name, 'params': params, **result})
+        print(f"{name:<18} {json.dumps(params):<55} {result['throughput']:>10.0f}/s  "
+              f"p50 {result['latency_us']['p50']:>8.1f}us  p99 {result['latency_us']['p99']:>8.1f}us  "
+              f"peak {result['peak_memory_bytes']:>8}B", flush=True)
+
+    output = args.output or os.path.join(ROOT, 'benchmarks', 'results', f"{results['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump(results, file, indent=1)
+    print(f"saved {output}")
+
+if __name__ == '__main__':
+    main()
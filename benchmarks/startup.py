@@ -0,0 +1,91 @@
+# description: measures the cold-start cost of the library; each case runs in a fresh interpreter,
+#              timing its wall clock and peak resident memory, and checking it writes nothing to stdout
+#              results use the schema of run.py, so they can be compared with compare.py
+#              run from the repository root: python benchmarks/startup.py [--runs N] [--output FILE]
+
+import argparse, datetime, json, os, platform, subprocess, sys, tempfile, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from run import commit, percentile
+
+CASES = {
+    'python': 'pass', # the interpreter alone, for reference
+    'mpgExpressions': 'import mpgExpressions',
+    'main': 'import main',
+    'first problem': 'import main, mpgExpressions; next(main.problem_generator(mpgExpressions.Closeform, seed=0))',
+    'mpgEvaluate': 'import mpgEvaluate',
+    'mpgRender': 'import mpgRender',
+    'mpgSolve': 'import mpgSolve',
+}
+
+def run_once(code, env=None):
+    """Runs code in a fresh interpreter; returns (seconds, peak resident bytes, stdout)"""
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-c', code], cwd=ROOT, env=env, stdout=subprocess.PIPE)
+    stdout = process.stdout.read()
+    process.stdout.close()
+    if hasattr(os, 'wait4'):
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        peak = usage.ru_maxrss * (1 if sys.platform == 'darwin' else 1024) # kilobytes on Linux
+    else:
+        process.wait()
+        peak = 0
+    seconds = time.perf_counter() - start
+    if process.returncode:
+        raise RuntimeError(f"{code!r} exited with status {process.returncode}")
+    return seconds, peak, stdout
+
+def measure(code, runs, env=None):
+    run_once(code, env) # warms the bytecode cache, as in a deployed worker
+    latencies, peaks, output = [], [], b''
+    for _ in range(runs):
+        seconds, peak, stdout = run_once(code, env)
+        latencies.append(seconds * 1e9)
+        peaks.append(peak)
+        output = output or stdout
+    latencies.sort()
+    return {
+        'calls': runs,
+        'throughput': runs / (sum(latencies) / 1e9),
+        'latency_us': {name: percentile(latencies, q) / 1e3 for name, q in
+                       (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('max', 1.0))},
+        'peak_memory_bytes': max(peaks),
+        'stdout_bytes': len(output),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks the startup time of the library")
+    parser.add_argument('--runs', type=int, default=20, help="fresh interpreters started per case")
+    parser.add_argument('--output', help="results file (default: benchmarks/results/<commit>-startup.json)")
+    args = parser.parse_args(argv)
+
+    results = {
+        'commit': commit(),
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'machine': platform.platform(),
+        'results': [],
+    }
+    # bytecode is cached outside the tree, even if the environment disables writing it
+    cache = tempfile.TemporaryDirectory()
+    env = dict(os.environ, PYTHONPYCACHEPREFIX=cache.name)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    for name, code in CASES.items():
+        result = measure(code, args.runs, env)
+        results['results'].append({'benchmark': 'startup', 'params': {'case': name}, **result})
+        print(f"{name:<15} p50 {result['latency_us']['p50'] / 1e3:>7.1f}ms  max {result['latency_us']['max'] / 1e3:>7.1f}ms  "
+              f"peak rss {result['peak_memory_bytes'] / 2**20:>6.1f}MiB"
+              + (f"  WROTE {result['stdout_bytes']}B TO STDOUT" if result['stdout_bytes'] else ''), flush=True)
+    cache.cleanup()
+
+    output = args.output or os.path.join(ROOT, 'benchmarks', 'results', f"{results['commit']}-startup.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump(results, file, indent=1)
+    print(f"saved {output}")
+
+if __name__ == '__main__':
+    main()
@@ -3,8 +3,217 @@
 # description: this file contains the classes for each individual from of mathematical expressions, e.g. polynomial, algebraic, closeform, & mathematical
 #              each class has certain functions and attributes unit to it
 
+import collections, hashlib, itertools, os, random, sys
 
-def problem_generator(expression, num_problems):
+import mpgExpressions
+
+EXPRESSIONS = {
+    'polynomial': mpgExpressions.Polynomial,
+    'algebraic': mpgExpressions.Algebraic,
+    'closeform': mpgExpressions.Closeform,
+}
+
+def problem_seed(seed, index):
+    """ Derives the seed of problem number index from a master seed, so each problem
+        is the same however the work is split up"""
+    digest = hashlib.blake2b(f"{seed}:{index}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+def generate_problem(expression, index, seed=None, randomize=False, difficulty=None):
+    """ Generates a single problem from a configured expression instance; with a seed,
+        problem number index is reproducible from (seed, index) alone, and the expression
+        is given a random.Random of its own for it
+        @difficulty: if given, draws random attributes of that difficulty (1 to 10)"""
+    generate_tree(expression, index, seed, randomize, difficulty)
+    return expression()
+
+def generate_tree(expression, index, seed=None, randomize=False, difficulty=None):
+    """ Like generate_problem, but returns the problem as a tree of mpgNodes nodes"""
+    if seed is not None:
+        expression.rng = random.Random(problem_seed(seed, index))
+    if difficulty is not None:
+        expression.random(difficulty)
+    elif randomize:
+        expression.random()
+    else:
+        expression.new()
+    return expression.tree()
+
+def problem_generator(expression, num_problems=None, chunk_size=None, randomize=False, seed=None, difficulty=None):
     """ A generator; generates randomized problems per attributes
-        @expression: type of math expression to generate from
-        @num_problems: number of problems to generate (will yield after each)"""
\ No newline at end of file
+        @expression: type of math expression to generate from, or a configured instance of one
+        @num_problems: number of problems to generate (will yield after each); None never stops
+        @chunk_size: if given, yields lists of up to chunk_size problems instead of single problems
+        @randomize: draws new random attributes for every problem, rather than keeping the set ones
+        @seed: master seed; makes every problem reproducible from (seed, problem index)
+        @difficulty: if given, every problem is drawn at that difficulty, 1 (easiest) to 10
+
+        Only one problem (or chunk) is held at a time, so memory stays constant however many are made"""
+    if isinstance(expression, type):
+        expression = expression()
+
+    def problems():
+        for index in itertools.count() if num_problems is None else range(num_problems):
+            yield generate_problem(expression, index, seed, randomize, difficulty)
+
+    if chunk_size is None:
+        yield from problems()
+    else:
+        yield from chunked(problems(), chunk_size)
+
+def chunked(stream, chunk_size):
+    """ A generator; yields lists of up to chunk_size items from a stream"""
+    if chunk_size < 1: # islice would give nothing, and the stream would look empty
+        raise ValueError(f"chunk_size must be at least 1: {chunk_size}")
+    while True:
+        chunk = list(itertools.islice(stream, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+def _generate_problems(expression, seed, start, stop, randomize, difficulty=None):
+    # runs in a worker; problems are seeded by index, not by worker
+    return [generate_problem(expression, index, seed, randomize, difficulty) for index in range(start, stop)]
+
+def _task_copy(expression, seed):
+    # the copy of the expression a chunk task generates from; a copy (or pickle) carries the rng, and its state,
+    # it was made with, so without a seed to replace it per problem, each task gets an rng of its own
+    import copy
+
+    task = copy.copy(expression)
+    if seed is None:
+        task.rng = random.Random()
+    return task
+
+def _ordered_chunks(submit, num_problems, chunk_size, window):
+    # submits chunk tasks, keeping at most window in flight, and yields their results in order
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be at least 1: {chunk_size}")
+    pending = collections.deque()
+    for start in range(0, num_problems, chunk_size):
+        pending.append(submit(start, min(start + chunk_size, num_problems)))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def parallel_problem_generator(expression, num_problems, seed=0, processes=None, chunk_size=256, randomize=False, difficulty=None):
+    """ A generator; generates problems across a pool of processes, yielding lists of up to
+        chunk_size problems in order
+        @expression: type of math expression to generate from, or a configured instance of one
+        @num_problems: number of problems to generate
+        @seed: master seed; problem number i is the same as problem_generator(..., seed=seed) makes
+        @processes: number of worker processes (default: one per core)
+        @chunk_size: number of problems generated per task
+
+        Without a seed, each task is given a random.Random of its own, so chunks don't repeat each other.
+        Only a few chunks per worker are in flight at once, so a slow consumer holds the pool back"""
+    if isinstance(expression, type):
+        expression = expression()
+
+    import concurrent.futures # loaded on first use, to keep startup fast
+
+    processes = processes or os.cpu_count() or 1
+    with concurrent.futures.ProcessPoolExecutor(processes) as pool:
+        submit = lambda start, stop : pool.submit(_generate_problems, _task_copy(expression, seed), seed, start, stop, randomize, difficulty)
+        yield from _ordered_chunks(submit, num_problems, chunk_size, 2 * processes)
+
+def threaded_problem_generator(expression, num_problems, seed=0, threads=None, chunk_size=256, randomize=False, difficulty=None):
+    """ A generator; like parallel_problem_generator, but in a pool of threads, e.g. inside a web service
+
+        Every task generates from its own copy of the expression, with its own random.Random (seeded
+        per problem, or unseeded when seed is None), so the threads share no generation state and take no locks"""
+    if isinstance(expression, type):
+        expression = expression()
+
+    import concurrent.futures
+
+    threads = threads or min(32, (os.cpu_count() or 1) + 4)
+    with concurrent.futures.ThreadPoolExecutor(threads) as pool:
+        submit = lambda start, stop : pool.submit(_generate_problems, _task_copy(expression, seed), seed, start, stop, randomize, difficulty)
+        yield from _ordered_chunks(submit, num_problems, chunk_size, 2 * threads)
+
+def write_problems(expression, num_problems, sink, chunk_size=1000, randomize=False, seed=None, processes=None, bank=None,
+                   difficulty=None):
+    """ Streams generated problems to a sink as JSON Lines (one problem per line), writing
+        a chunk at a time; returns the number of problems written
+        @sink: a writable text file object, or a path to create
+        @processes: if given, generates in that many worker processes (seed defaults to 0)
+        @bank: if given, a mpgBank.ProblemBank; only problems not already in it are written
+        @difficulty: if given, every problem is drawn at that difficulty, 1 (easiest) to 10"""
+    if chunk_size < 1: # checked before a file is made
+        raise ValueError(f"chunk_size must be at least 1: {chunk_size}")
+    if isinstance(sink, str):
+        with open(sink, 'w') as file:
+            return write_problems(expression, num_problems, file, chunk_size, randomize, seed, processes, bank, difficulty)
+
+    import json
+
+    if bank is not None:
+        if processes is not None:
+            raise ValueError("unique problems are generated in a single process")
+        from mpgBank import unique_problem_generator
+        problems = unique_problem_generator(expression, num_problems, bank, randomize, seed, difficulty=difficulty)
+        chunks = chunked(problems, chunk_size)
+    elif processes is None:
+        chunks = problem_generator(expression, num_problems, chunk_size, randomize, seed, difficulty)
+    else:
+        chunks = parallel_problem_generator(expression, num_problems, seed or 0, processes, chunk_size, randomize, difficulty)
+
+    count = 0
+    for chunk in chunks:
+        sink.write(''.join(json.dumps(problem) + '\n' for problem in chunk))
+        count += len(chunk)
+    return count
+
+def main(argv=None):
+    import argparse
+
+    def positive_int(text):
+        value = int(text)
+        if value < 1:
+            raise argparse.ArgumentTypeError(f"must be at least 1: {value}")
+        return value
+
+    parser = argparse.ArgumentParser(description="Generates math problems as JSON Lines")
+    parser.add_argument('expression', choices=sorted(EXPRESSIONS))
+    parser.add_argument('num_problems', type=int)
+    parser.add_argument('-o', '--output', help="file to write to (default: stdout)")
+    parser.add_argument('--chunk-size', type=positive_int, default=1000)
+    parser.add_argument('--fixed', action='store_true', help="keep the default attributes instead of randomizing them")
+    parser.add_argument('--seed', type=int, help="master seed, for reproducible problems")
+    parser.add_argument('-p', '--processes', type=int, help="generate in this many worker processes")
+    parser.add_argument('--unique', action='store_true', help="never repeat a problem")
+    parser.add_argument('--bank', help="problem bank file; skips problems already in it, and adds the new ones (implies --unique)")
+    parser.add_argument('-d', '--difficulty', type=int, choices=range(1, 11), metavar='1-10',
+                        help="generate every problem at this difficulty")
+    parser.add_argument('--format', choices=('json', 'binary'), default='json',
+                        help="JSON Lines, or a binary archive (see mpgBinary; needs --output)")
+    parser.add_argument('--simplify', action='store_true',
+                        help="drop zero terms, fold **0 and **1, merge like terms and reduce fractions "
+                             "(problems then don't keep the generated list shape; see Expression.simplify)")
+    args = parser.parse_args(argv)
+    expression = EXPRESSIONS[args.expression](simplify=args.simplify)
+
+    if args.format == 'binary':
+        if not args.output or args.processes or args.unique or args.bank:
+            parser.error("--format binary needs --output, and doesn't take --processes, --unique or --bank")
+        from mpgBinary import write_archive
+        write_archive(expression, args.num_problems, args.output, not args.fixed, args.seed, args.difficulty)
+        return
+
+    bank = None
+    if args.unique or args.bank:
+        from mpgBank import ProblemBank
+        bank = ProblemBank(args.bank)
+
+    sink = args.output if args.output else sys.stdout
+    try:
+        write_problems(expression, args.num_problems, sink, args.chunk_size, not args.fixed,
+                       args.seed, args.processes, bank, args.difficulty)
+    finally:
+        if bank is not None:
+            bank.close()
+
+if __name__ == '__main__':
+    main()
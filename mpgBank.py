@@ -0,0 +1,264 @@
+# description: a deduplicating problem bank; every generated expression is canonicalized (fractions
+#              reduced, signs on numerators, commutative sums and products flattened and sorted) and
+#              hashed, and the digests are kept in an open-addressing hash table in a memory-mapped
+#              file, so checking a problem against millions of others is O(1) and takes 16 bytes each
+
+import hashlib, itertools, mmap, os, struct
+from fractions import Fraction
+
+from mpgNodes import Node, Const, Rational, Var, Pow, Mul, Add, Div, Func, Root, node_cache
+
+DIGEST_SIZE = 16
+MAGIC = b'MPGBANK1'
+HEADER = struct.Struct('<8sQQ') # magic, capacity (slots), count (digests stored)
+EMPTY = bytes(DIGEST_SIZE)
+MAX_LOAD = 0.7 # the table doubles when it's fuller than this
+
+def _fraction(value):
+    # the node of a reduced fraction, with the sign on the numerator
+    if value.denominator == 1:
+        return Const(value.numerator)
+    return Rational(value.numerator, value.denominator)
+
+def _flattened(node, kind, field):
+    # the children of a sum or product, with nested sums (products) spliced in
+    children = []
+    for child in getattr(node, field):
+        child = canonical(child)
+        children.extend(getattr(child, field) if type(child) is kind else (child,))
+    return tuple(sorted(children, key=encoding))
+
+@node_cache
+def canonical(node):
+    """Returns the canonical form of a tree: coefficients are reduced fractions with the sign on the
+    numerator, and sums and products are flattened with their terms (factors) in a fixed order, so
+    problems that differ only in the order of terms have the same canonical form"""
+    kind = type(node)
+    if kind is Const or kind is Var:
+        return node
+    elif kind is Rational:
+        return _fraction(Fraction(node.numer, node.denom))
+    elif kind is Add:
+        return Add(_flattened(node, Add, 'terms'))
+    elif kind is Mul:
+        return Mul(_flattened(node, Mul, 'factors'))
+    elif kind is Pow:
+        return Pow(canonical(node.base), node.exp)
+    elif kind is Div:
+        return Div(canonical(node.numer), canonical(node.denom))
+    elif kind is Func:
+        return Func(node.name, canonical(node.arg))
+    elif kind is Root:
+        return Root(node.n, canonical(node.arg))
+    raise TypeError(f"not an expression node: {node!r}")
+
+@node_cache
+def encoding(node):
+    """Returns an unambiguous byte string of a tree, in prefix notation; equal trees, and only
+    equal trees, have equal encodings"""
+    kind = type(node)
+    if kind is Const:
+        return b'%d' % node.value
+    elif kind is Rational:
+        return b'%d/%d' % (node.numer, node.denom)
+    elif kind is Var:
+        return b'$' + node.name.encode()
+    elif kind is Add:
+        return b'+(' + b','.join(map(encoding, node.terms)) + b')'
+    elif kind is Mul:
+        return b'*(' + b','.join(map(encoding, node.factors)) + b')'
+    elif kind is Pow:
+        return b'^%d(' % node.exp + encoding(node.base) + b')'
+    elif kind is Div:
+        return b'/(' + encoding(node.numer) + b',' + encoding(node.denom) + b')'
+    elif kind is Func:
+        return node.name.encode() + b'(' + encoding(node.arg) + b')'
+    elif kind is Root:
+        return b'r%d(' % node.n + encoding(node.arg) + b')'
+    raise TypeError(f"not an expression node: {node!r}")
+
+def digest(expression):
+    """Returns the 16-byte content address of an expression: the hash of its canonical form
+
+    @expression: a Polynomial, Algebraic or Closeform instance, or an mpgNodes tree"""
+    node = expression if isinstance(expression, Node) else expression.tree()
+    result = hashlib.blake2b(encoding(canonical(node)), digest_size=DIGEST_SIZE).digest()
+    return result if result != EMPTY else b'\x01' + result[1:] # all zeros marks an empty slot
+
+class DigestTable:
+    """A set of 16-byte digests in an open-addressing (linear probing) hash table, kept in a
+    memory-mapped file, or in anonymous memory if no path is given
+
+    Lookups and insertions are O(1); the table doubles (rehashing into a new file) once it's
+    MAX_LOAD full. Not safe to share between threads or processes while adding"""
+
+    def __init__(self, path=None, capacity=1 << 16):
+        self.path = path
+        if path is not None and os.path.exists(path) and os.path.getsize(path):
+            self._open(path)
+        else:
+            self._create(path, capacity)
+
+    def __repr__(self):
+        return f"DigestTable(path={self.path!r}, count={self.count}, capacity={self.capacity})"
+
+    def _create(self, path, capacity):
+        capacity = 1 << max(capacity - 1, 1).bit_length() # a power of two, for masking
+        size = HEADER.size + capacity * DIGEST_SIZE
+        if path is None:
+            self._file, self._mm = None, mmap.mmap(-1, size)
+        else:
+            self._file = open(path, 'w+b')
+            self._file.truncate(size)
+            self._mm = mmap.mmap(self._file.fileno(), size)
+        self.capacity, self.count = capacity, 0
+        HEADER.pack_into(self._mm, 0, MAGIC, capacity, 0)
+
+    def _open(self, path):
+        self._file = open(path, 'r+b')
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+        magic, self.capacity, self.count = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or len(self._mm) != HEADER.size + self.capacity * DIGEST_SIZE:
+            self.close()
+            raise ValueError(f"not a problem bank: {path}")
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, key):
+        return self._find(key)[1]
+
+    def __iter__(self):
+        """A generator; yields the stored digests, in table order"""
+        mm = self._mm
+        for offset in range(HEADER.size, len(mm), DIGEST_SIZE):
+            slot = mm[offset:offset+DIGEST_SIZE]
+            if slot != EMPTY:
+                yield slot
+
+    def _find(self, key):
+        # returns (offset of the key's slot, or the empty slot it would go in; whether it's there)
+        mm, mask = self._mm, self.capacity - 1
+        index = int.from_bytes(key[:8], 'little') & mask
+        while True:
+            offset = HEADER.size + index * DIGEST_SIZE
+            slot = mm[offset:offset+DIGEST_SIZE]
+            if slot == key:
+                return offset, True
+            if slot == EMPTY:
+                return offset, False
+            index = (index + 1) & mask
+
+    def add(self, key):
+        """Adds a digest; returns True if it was new, False if it was already there"""
+        if len(key) != DIGEST_SIZE or key == EMPTY:
+            raise ValueError(f"not a digest: {key!r}")
+        offset, found = self._find(key)
+        if found:
+            return False
+        if self.count + 1 > self.capacity * MAX_LOAD:
+            self._grow()
+            offset = self._find(key)[0]
+        self._mm[offset:offset+DIGEST_SIZE] = key
+        self.count += 1
+        HEADER.pack_into(self._mm, 0, MAGIC, self.capacity, self.count)
+        return True
+
+    def _grow(self):
+        # rehashes into a table twice the size; a file is rebuilt beside the old one, then replaces it
+        path = None if self.path is None else self.path + '.grow'
+        if path is not None and os.path.exists(path): # left by an interrupted grow
+            os.remove(path)
+        grown = DigestTable(path, self.capacity * 2)
+        for key in self:
+            offset = grown._find(key)[0]
+            grown._mm[offset:offset+DIGEST_SIZE] = key
+        grown.count = self.count
+        HEADER.pack_into(grown._mm, 0, MAGIC, grown.capacity, grown.count)
+
+        if self.path is None:
+            self._mm.close()
+            self._mm, self.capacity = grown._mm, grown.capacity
+            return
+        grown.close()
+        self.close()
+        os.replace(grown.path, self.path)
+        self._open(self.path)
+
+    def flush(self):
+        self._mm.flush()
+
+    def close(self):
+        if self._mm is not None and not self._mm.closed:
+            if self._file is not None:
+                self._mm.flush()
+            self._mm.close()
+        if self._file is not None:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class ProblemBank:
+    """The content addresses of every problem made so far, for rejecting duplicates
+
+    @path: the bank file, which is created or reopened; None keeps the bank in memory
+    @capacity: the number of slots to start with, if the file is new"""
+
+    def __init__(self, path=None, capacity=1 << 16):
+        self.table = DigestTable(path, capacity)
+
+    def __repr__(self):
+        return f"ProblemBank(path={self.table.path!r}, problems={len(self.table)})"
+
+    def __len__(self):
+        return len(self.table)
+
+    def __contains__(self, expression):
+        return digest(expression) in self.table
+
+    def add(self, expression):
+        """Adds an expression (or tree); returns True if it's new, False if it's a duplicate"""
+        return self.table.add(digest(expression))
+
+    def close(self):
+        self.table.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def unique_problem_generator(expression, num_problems, bank=None, randomize=False, seed=None, max_rejections=100000,
+                             difficulty=None):
+    """ A generator; like main.problem_generator, but skips every problem already in the bank,
+        yielding num_problems new ones and adding them to it
+        @bank: a ProblemBank, e.g. one reopened from a file to stay unique across runs; by default
+               the problems are only unique among themselves
+        @seed: master seed; problem indexes count rejected problems too
+        @max_rejections: stops early after this many duplicates in a row, when the expression's
+                         settings can't make enough distinct problems (None never stops)
+        @difficulty: if given, every problem is drawn at that difficulty, 1 (easiest) to 10"""
+    from main import generate_problem
+
+    if isinstance(expression, type):
+        expression = expression()
+    if bank is None:
+        bank = ProblemBank()
+
+    made, rejections = 0, 0
+    for index in itertools.count():
+        if made >= num_problems:
+            return
+        problem = generate_problem(expression, index, seed, randomize, difficulty)
+        if bank.add(expression):
+            made, rejections = made + 1, 0
+            yield problem
+        else:
+            rejections += 1
+            if max_rejections is not None and rejections >= max_rejections:
+                return
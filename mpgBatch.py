@@ -0,0 +1,70 @@
+# description: vectorized batch generation of coefficients using NumPy; mpgExpressions only imports
+#              this module when a batch is requested, so NumPy stays an optional dependency
+
+import numpy as np
+
+from mpgExpressions import coefficient_sampler
+
+# one coefficient per record; sign is +1/-1 and whole numbers (value/1 fractions included) have a denominator of 1
+COEFFICIENT_DTYPE = np.dtype([('sign', np.int8), ('numer', np.int32), ('denom', np.int32)])
+
+def get_coefficients_batch(n_expressions, degree, lowbound=-10, highbound=10, rng=None):
+    """Creates the coefficients for n_expressions expressions of the given degree in one pass,
+    resulting in a (n_expressions, degree+1) structured array of COEFFICIENT_DTYPE
+
+    Follows the same rules as Expression.get_coefficients: 60% integers (half of them 0),
+    20% 1/value and 20% value/value fractions, no value/0, 0/value or a/a forms, and
+    the first coefficient of each expression is never 0
+
+    @rng: a numpy Generator, or a seed for a new one"""
+
+    if lowbound > highbound:
+        lowbound, highbound = highbound, lowbound
+    sampler = coefficient_sampler(lowbound, highbound) # resolves the effective range
+    low, high = sampler.lowbound, sampler.highbound
+    if not isinstance(rng, np.random.Generator):
+        rng = np.random.default_rng(rng)
+
+    shape = (n_expressions, degree+1)
+    kind = rng.integers(0, 5, shape) # 0: 1/value, 1: value/value, 2-4: integer
+    values = rng.integers(low, high, shape)
+
+    # denominators are drawn from the range with 0 removed, so no value/0 retries are needed
+    nonzero = high - low - (low <= 0 < high)
+    if nonzero == 0:
+        raise ValueError(f"no non-zero denominators in range: {low}, {high}")
+    denoms = rng.integers(low, low + nonzero, shape)
+    if low <= 0 < high:
+        denoms[denoms >= 0] += 1
+
+    integer = kind > 1
+    unit = kind == 0
+
+    numers = np.where(unit, 1, values)
+    numers[integer & (rng.integers(0, 2, shape) == 0)] = 0 # integers are 0 half the time
+
+    # 1/1, a/a and 0/b forms collapse to whole numbers
+    whole = integer | (numers == 0) | (np.abs(numers) == np.abs(denoms))
+    numers[~integer & (numers != 0) & whole] = 1
+
+    out = np.empty(shape, dtype=COEFFICIENT_DTYPE)
+    out['numer'] = np.abs(numers)
+    out['denom'] = np.where(whole, 1, np.abs(denoms))
+    # fractions take the sign of their denominator, as in mpgExpressions.package_coefficient
+    out['sign'] = np.where(np.where(whole, numers, denoms) >= 0, 1, -1)
+
+    lead = out['numer'][:, 0] == 0 # prevent first element from being 0
+    out['numer'][lead, 0] = 1
+    out['sign'][lead, 0] = 1
+    return out
+
+def to_coefficient_lists(row):
+    """Converts one row of a batch back into the coefficient lists of Expression.get_coefficients"""
+    coeffs = []
+    for sign, numer, denom in row.tolist():
+        sign = '+' if sign > 0 else '-'
+        if denom == 1:
+            coeffs.append([sign, numer])
+        else:
+            coeffs.append([sign, numer, '/', denom])
+    return coeffs
@@ -0,0 +1,297 @@
+# description: a compact binary format for generated expressions, and archives of them; trees are
+#              written in prefix order as one-byte opcodes followed by varint operands, indeterminants
+#              are numbered in a symbol table shared by the archive, and an offset index at the end of
+#              the file lets a reader get any problem straight from a memory map without loading the rest
+
+import array, mmap, struct, sys, weakref
+
+from mpgNodes import Node, Const, Rational, Var, Pow, Mul, Add, Div, Func, Root
+
+MAGIC = b'MPGBIN1\0'
+TRAILER = struct.Struct('<QQQ8s') # symbol table offset, index offset, problem count, magic
+
+# opcodes; each function of a generated expression has its own
+CONST, RATIONAL, VAR, POW, MUL, ADD, DIV, ROOT, LOG = range(9)
+FUNCTIONS = ('sin', 'cos', 'tan', 'csc', 'sec', 'cot',
+             'arcsin', 'arccos', 'arctan', 'arccsc', 'arcsec', 'arccot',
+             'sinh', 'cosh', 'tanh', 'csch', 'sech', 'coth',
+             'arcsinh', 'arccosh', 'arctanh', 'arccsch', 'arcsech', 'arccoth',
+             'ln', 'exp')
+FUNC = 16 # FUNC + i is FUNCTIONS[i] of the argument that follows
+FUNCTION_OPCODES = {name: FUNC + i for i, name in enumerate(FUNCTIONS)}
+
+def _varint(value, out):
+    # unsigned LEB128; 7 bits a byte, low bits first
+    while value > 0x7f:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+def _zigzag(value):
+    # maps signed to unsigned so small magnitudes stay small: 0, -1, 1, -2... -> 0, 1, 2, 3...
+    return value << 1 if value >= 0 else (-value << 1) - 1
+
+def _read_varint(buffer, pos):
+    result = shift = 0
+    while True:
+        byte = buffer[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+def _read_signed(buffer, pos):
+    value, pos = _read_varint(buffer, pos)
+    return (value >> 1) ^ -(value & 1), pos
+
+def encode(node, symbols, out=None):
+    """Encodes a tree, appending to the bytearray out; returns out
+
+    @symbols: dict of indeterminant -> number, which new indeterminants are added to"""
+    if out is None:
+        out = bytearray()
+    kind = type(node)
+    if kind is Const:
+        out.append(CONST)
+        _varint(_zigzag(node.value), out)
+    elif kind is Rational:
+        out.append(RATIONAL)
+        _varint(_zigzag(node.numer), out)
+        _varint(node.denom, out)
+    elif kind is Var:
+        out.append(VAR)
+        _varint(symbols.setdefault(node.name, len(symbols)), out)
+    elif kind is Pow:
+        out.append(POW)
+        _varint(node.exp, out)
+        encode(node.base, symbols, out)
+    elif kind is Mul or kind is Add:
+        children = node.factors if kind is Mul else node.terms
+        out.append(MUL if kind is Mul else ADD)
+        _varint(len(children), out)
+        for child in children:
+            encode(child, symbols, out)
+    elif kind is Div:
+        out.append(DIV)
+        encode(node.numer, symbols, out)
+        encode(node.denom, symbols, out)
+    elif kind is Root:
+        out.append(ROOT)
+        _varint(node.n, out)
+        encode(node.arg, symbols, out)
+    elif kind is Func:
+        if node.name.startswith('log-'):
+            out.append(LOG)
+            _varint(int(node.name[4:]), out)
+        elif node.name in FUNCTION_OPCODES:
+            out.append(FUNCTION_OPCODES[node.name])
+        else:
+            raise ValueError(f"unknown function: {node.name}")
+        encode(node.arg, symbols, out)
+    else:
+        raise TypeError(f"not an expression node: {node!r}")
+    return out
+
+def decode(buffer, symbols, pos=0):
+    """Decodes the tree starting at pos of a buffer (bytes, memoryview or mmap); returns (node, end)
+
+    @symbols: sequence of the indeterminants, by number"""
+    opcode = buffer[pos]
+    pos += 1
+    if opcode == CONST:
+        value, pos = _read_signed(buffer, pos)
+        return Const(value), pos
+    elif opcode == RATIONAL:
+        numer, pos = _read_signed(buffer, pos)
+        denom, pos = _read_varint(buffer, pos)
+        return Rational(numer, denom), pos
+    elif opcode == VAR:
+        index, pos = _read_varint(buffer, pos)
+        return Var(symbols[index]), pos
+    elif opcode == POW:
+        exp, pos = _read_varint(buffer, pos)
+        base, pos = decode(buffer, symbols, pos)
+        return Pow(base, exp), pos
+    elif opcode == MUL or opcode == ADD:
+        count, pos = _read_varint(buffer, pos)
+        children = []
+        for _ in range(count):
+            child, pos = decode(buffer, symbols, pos)
+            children.append(child)
+        return (Mul if opcode == MUL else Add)(tuple(children)), pos
+    elif opcode == DIV:
+        numer, pos = decode(buffer, symbols, pos)
+        denom, pos = decode(buffer, symbols, pos)
+        return Div(numer, denom), pos
+    elif opcode == ROOT:
+        n, pos = _read_varint(buffer, pos)
+        arg, pos = decode(buffer, symbols, pos)
+        return Root(n, arg), pos
+    elif opcode == LOG:
+        base, pos = _read_varint(buffer, pos)
+        arg, pos = decode(buffer, symbols, pos)
+        return Func(f"log-{base}", arg), pos
+    elif FUNC <= opcode < FUNC + len(FUNCTIONS):
+        arg, pos = decode(buffer, symbols, pos)
+        return Func(FUNCTIONS[opcode - FUNC], arg), pos
+    raise ValueError(f"bad opcode {opcode} at {pos - 1}")
+
+class ArchiveWriter:
+    """Writes expressions to an archive file, one record per problem
+
+    Records are appended as they're added; the symbol table and the offset index are written
+    by close(), so only the offsets (8 bytes a problem) are held in memory"""
+
+    def __init__(self, path):
+        self.path = path
+        self.symbols = {}
+        self._file = open(path, 'wb')
+        self._file.write(MAGIC)
+        self._offsets = array.array('Q')
+        self._position = len(MAGIC)
+        self._cache = weakref.WeakKeyDictionary() # encodings of live trees; symbol numbers never change
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def add(self, expression):
+        """Appends an expression (or tree); returns its index in the archive"""
+        node = expression if isinstance(expression, Node) else expression.tree()
+        record = self._cache.get(node)
+        if record is None:
+            record = self._cache[node] = bytes(encode(node, self.symbols))
+        self._offsets.append(self._position)
+        self._file.write(record)
+        self._position += len(record)
+        return len(self._offsets) - 1
+
+    def close(self):
+        if self._file.closed:
+            return
+        symbols_offset = self._position
+        table = bytearray()
+        _varint(len(self.symbols), table)
+        for name in sorted(self.symbols, key=self.symbols.get):
+            name = name.encode()
+            _varint(len(name), table)
+            table += name
+        table += bytes(-(symbols_offset + len(table)) % 8) # aligns the index, for reading in place
+        self._file.write(table)
+
+        offsets = self._offsets
+        if sys.byteorder != 'little':
+            offsets = array.array('Q', offsets)
+            offsets.byteswap()
+        self._file.write(offsets.tobytes())
+        self._file.write(TRAILER.pack(symbols_offset, symbols_offset + len(table), len(self._offsets), MAGIC))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class Archive:
+    """Reads an archive through a memory map; problems are decoded one at a time, on access,
+    so opening an archive of millions of problems costs no more than opening a small one
+
+    archive[i] is the tree of problem i, archive.record(i) its encoding as a zero-copy memoryview,
+    which stays readable after the archive is closed, until it's dropped"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            self._mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buffer = memoryview(self._mm)
+        symbols_offset, index_offset, count, magic = TRAILER.unpack_from(self._mm, len(self._mm) - TRAILER.size)
+        if self._buffer[:len(MAGIC)] != MAGIC or magic != MAGIC:
+            self.close()
+            raise ValueError(f"not a problem archive: {path}")
+
+        symbols, pos = [], symbols_offset
+        size, pos = _read_varint(self._buffer, pos)
+        for _ in range(size):
+            length, pos = _read_varint(self._buffer, pos)
+            symbols.append(bytes(self._buffer[pos:pos+length]).decode())
+            pos += length
+        self.symbols = tuple(symbols)
+
+        self._count = count
+        self._records_end = symbols_offset
+        index = self._buffer[index_offset:index_offset + 8*count]
+        if sys.byteorder == 'little':
+            self._offsets = index.cast('Q') # read in place from the map
+        else:
+            self._offsets = array.array('Q', index)
+            self._offsets.byteswap()
+
+    def __repr__(self):
+        return f"Archive(path={self.path!r}, problems={self._count})"
+
+    def __len__(self):
+        return self._count
+
+    def _bounds(self, index):
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("archive index out of range")
+        end = self._offsets[index + 1] if index + 1 < self._count else self._records_end
+        return self._offsets[index], end
+
+    def record(self, index):
+        """Returns the encoding of problem index, as a memoryview of the map"""
+        start, end = self._bounds(index)
+        return self._buffer[start:end]
+
+    def __getitem__(self, index):
+        start, _ = self._bounds(index)
+        return decode(self._buffer, self.symbols, start)[0]
+
+    def __iter__(self):
+        """A generator; yields the trees of the problems in order"""
+        pos, buffer, symbols = len(MAGIC), self._buffer, self.symbols
+        for _ in range(self._count):
+            node, pos = decode(buffer, symbols, pos)
+            yield node
+
+    def records(self):
+        """A generator; yields the encoding of each problem as a memoryview, without decoding any"""
+        for index in range(self._count):
+            yield self.record(index)
+
+    def close(self):
+        """Closes the archive; record views still held keep the map open until the last of them is dropped"""
+        for view in ('_offsets', '_buffer'):
+            view = self.__dict__.pop(view, None)
+            if isinstance(view, memoryview):
+                view.release()
+        mm, self._mm = self._mm, None
+        if mm is not None:
+            try:
+                mm.close()
+            except BufferError: # records are still held; the map is unmapped when they're freed
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def write_archive(expression, num_problems, path, randomize=False, seed=None, difficulty=None):
+    """Generates problems into an archive file; returns the number written
+
+    @expression: type of math expression to generate from, or a configured instance of one
+    @seed: master seed; problem i is the same as main.problem_generator(..., seed=seed) makes
+    @difficulty: if given, every problem is drawn at that difficulty, 1 (easiest) to 10"""
+    from main import generate_tree
+
+    if isinstance(expression, type):
+        expression = expression()
+    with ArchiveWriter(path) as writer:
+        for index in range(num_problems):
+            writer.add(generate_tree(expression, index, seed, randomize, difficulty))
+    return num_problems
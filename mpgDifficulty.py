@@ -0,0 +1,169 @@
+# description: difficulty-targeted generation; a cheap structural score rates every expression tree, and a
+#              table of the expected score of each generator configuration (degree, indeterminants, root,
+#              rational/proper, trig/log/expo) is precomputed once per process, so a problem at a given
+#              difficulty is made by drawing a configuration of that difficulty, with nothing rejected
+
+import bisect, functools, itertools, random
+
+from mpgNodes import Const, Rational, Var, Pow, Mul, Add, Div, Func, Root, COEFFICIENTS, node_cache
+
+# the weights of the score; each piece of notation adds what it takes to work with it
+FUNCTION_WEIGHTS = {
+    'sin': 2, 'cos': 2, 'tan': 2, 'csc': 2, 'sec': 2, 'cot': 2,
+    'arcsin': 3, 'arccos': 3, 'arctan': 3, 'arccsc': 3, 'arcsec': 3, 'arccot': 3,
+    'sinh': 3, 'cosh': 3, 'tanh': 3, 'csch': 3, 'sech': 3, 'coth': 3,
+    'arcsinh': 4, 'arccosh': 4, 'arctanh': 4, 'arccsch': 4, 'arcsech': 4, 'arccoth': 4,
+    'ln': 2, 'log': 3, 'exp': 2,
+}
+FRACTION = 1 # a fractional coefficient
+INDETERMINANT = 1
+POWER = 1 # raising to a power above 1
+PRODUCT = 1 # each extra non-constant factor of a product
+QUOTIENT = 3
+ROOT = 2 # a square root; each degree above adds ROOT_STEP
+ROOT_STEP = 0.5
+
+# the upper bounds of the scores of difficulties 1 to 9; scores above the last are difficulty 10
+LEVELS = (6, 9, 12, 16, 20, 25, 31, 38, 46)
+DIFFICULTIES = range(1, len(LEVELS) + 2)
+
+# the configurations random() draws from, and how likely it is to draw each
+DEGREES = (1, 2, 3, 4, 5)
+INDETS = ('x', 'xy', 'xyz', 'wxyz')
+ROOTS = {2: 54/89, 3: 20/89, 4: 10/89, **{n: 5/89/6 for n in range(5, 11)}}
+BOOLS = (True, False)
+SAMPLES = 16 # expressions generated per configuration when calibrating
+SEED = 0 # the calibration is the same in every process
+
+def function_weight(name):
+    if name.startswith('log-'):
+        return FUNCTION_WEIGHTS['log']
+    return FUNCTION_WEIGHTS[name]
+
+@node_cache
+def score(node):
+    """Returns the structural difficulty score of a tree; computed once per distinct (sub)expression"""
+    kind = type(node)
+    if kind is Const:
+        return 0
+    elif kind is Rational:
+        return FRACTION
+    elif kind is Var:
+        return INDETERMINANT
+    elif kind is Pow:
+        return score(node.base) + (POWER if node.exp > 1 else 0)
+    elif kind is Mul:
+        variable = sum(type(f) not in COEFFICIENTS for f in node.factors)
+        return sum(map(score, node.factors)) + PRODUCT * max(variable - 1, 0)
+    elif kind is Add:
+        return sum(map(score, node.terms))
+    elif kind is Div:
+        return score(node.numer) + score(node.denom) + QUOTIENT
+    elif kind is Root:
+        return score(node.arg) + ROOT + ROOT_STEP * max(node.n - 2, 0)
+    elif kind is Func:
+        return score(node.arg) + function_weight(node.name)
+    raise TypeError(f"not an expression node: {node!r}")
+
+def level(value):
+    """Returns the difficulty, 1 to 10, of a score"""
+    return bisect.bisect_left(LEVELS, value) + 1
+
+def difficulty(expression):
+    """Returns the difficulty, 1 to 10, of a Polynomial, Algebraic or Closeform instance or a tree"""
+    return level(score(expression if not hasattr(expression, 'tree') else expression.tree()))
+
+@functools.lru_cache(maxsize=None)
+def _calibration():
+    # the mean scores of the parts expressions are built from, by generating SAMPLES of each:
+    # polynomials by (degree, indets), algebraic forms by (degree, indets, rational, proper) with
+    # square roots, and closed-form function terms by (trig, log, expo)
+    from mpgExpressions import Algebraic, Closeform, polynomial_tree, algebraic_tree
+
+    rng = random.Random(SEED)
+    mean = lambda build : sum(score(build()) for _ in range(SAMPLES)) / SAMPLES
+
+    polynomials = {(d, i): mean(lambda : polynomial_tree(d, i, rng=rng)) for d in DEGREES for i in INDETS}
+
+    context = Algebraic(rng=rng)
+    algebraics = {}
+    for d, i, rational, proper in itertools.product(DEGREES, INDETS, BOOLS, BOOLS):
+        context.degree, context.indets, context.root, context.rational, context.proper = d, i, 2, rational, proper
+        algebraics[d, i, rational, proper] = mean(lambda : algebraic_tree(context))
+
+    context = Closeform(rng=rng)
+    functions = {}
+    for trig, log, expo in itertools.product(BOOLS, BOOLS, BOOLS):
+        context.trig, context.log, context.expo = trig, log, expo
+        functions[trig, log, expo] = mean(lambda : Add(context.get_functions()))
+
+    return polynomials, algebraics, functions
+
+def _algebraic_configurations(algebraics, form=None):
+    # yields (attributes, probability, expected score); rational and proper are drawn (each of the four
+    # forms 1 in 4) unless form fixes them as (rational, proper), and then they're left out of the
+    # attributes. Every form has exactly one root, so the degree of the root only adds its weight to the square root's
+    for (d, i, rational, proper), expected in algebraics.items():
+        if form is not None and (rational, proper) != form:
+            continue
+        for root, p in ROOTS.items():
+            attributes = dict(degree=d, indets=i, root=root)
+            if form is None:
+                attributes.update(rational=rational, proper=proper)
+            yield attributes, p if form is not None else p / 4, expected + ROOT_STEP * (root - 2)
+
+def configurations(kind, form=(True, True)):
+    """A generator; yields (attributes, probability, expected score) for every configuration that
+    random() on the class named kind can draw
+    @form: (rational, proper) of Algebraic expressions, which random() keeps as they're set rather than drawing"""
+    polynomials, algebraics, functions = _calibration()
+    n = len(DEGREES) * len(INDETS)
+
+    if kind == 'Polynomial':
+        for (d, i), expected in polynomials.items():
+            yield dict(degree=d, indets=i), 1 / n, expected
+    elif kind == 'Algebraic':
+        for attributes, p, expected in _algebraic_configurations(algebraics, form):
+            yield attributes, p / n, expected
+    elif kind == 'Closeform':
+        # the functions are multiplied (1 in 4), divided (1 in 4) or added onto the base expression
+        joined = (PRODUCT + QUOTIENT) / 4
+        bases = [(dict(degree=d, indets=i, albool=False), 1 / (2*n), expected) for (d, i), expected in polynomials.items()]
+        bases += [(dict(attributes, albool=True), p / (2*n), expected)
+                  for attributes, p, expected in _algebraic_configurations(algebraics)]
+        for (trig, log, expo), function_score in functions.items():
+            for attributes, p, expected in bases:
+                yield dict(attributes, trig=trig, log=log, expo=expo), p / 8, expected + function_score + joined
+    else:
+        raise ValueError(f"no difficulty model for {kind}")
+
+@functools.lru_cache(maxsize=None)
+def difficulty_table(kind, form=(True, True)):
+    """Returns {difficulty: (configurations, cumulative probabilities)} for the class named kind,
+    where each configuration's expected score is of that difficulty; built on first use
+    @form: (rational, proper) of Algebraic expressions; see configurations()"""
+    table = {}
+    for attributes, p, expected in configurations(kind, form):
+        configs, weights = table.setdefault(level(expected), ([], []))
+        configs.append(attributes)
+        weights.append(p)
+    return {d: (configs, list(itertools.accumulate(weights))) for d, (configs, weights) in sorted(table.items())}
+
+def difficulties(kind, form=(True, True)):
+    """Returns the difficulties the class named kind can generate at"""
+    return tuple(difficulty_table(kind, form))
+
+def configure(expression, target, rng=None):
+    """Sets the attributes of an expression to a random configuration of the target difficulty
+    (1 to 10), drawn as random() would draw it; if the class has none at the target, the
+    nearest difficulty it has is used. Attributes random() doesn't draw (an Algebraic's
+    rational and proper) are left as they are, and the configuration is drawn for them"""
+    if target not in DIFFICULTIES:
+        raise ValueError(f"difficulty must be 1 to {DIFFICULTIES[-1]}: {target}")
+    kind = type(expression).__name__
+    table = difficulty_table(kind, (expression.rational, expression.proper)) if kind == 'Algebraic' else difficulty_table(kind)
+    nearest = min(table, key=lambda d : (abs(d - target), d))
+    configs, weights = table[nearest]
+    rng = rng or expression.rng
+    for name, value in rng.choices(configs, cum_weights=weights)[0].items():
+        setattr(expression, name, value)
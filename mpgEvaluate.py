@@ -0,0 +1,162 @@
+# description: compiles generated expressions into fast numeric functions; a tree is turned into
+#              Python source once, and the compiled function runs over NumPy arrays of sample
+#              points (or plain floats, with the math backend)
+
+import functools, math
+
+from mpgNodes import Node, Const, Rational, Var, Pow, Mul, Add, Div, Func, Root, node_cache
+
+np = None # NumPy is optional, and imported on first use; without it only the math backend is available
+
+def _reciprocal(funct):
+    return lambda x : 1/funct(x)
+
+def _of_reciprocal(funct):
+    return lambda x : funct(1/x)
+
+def _namespace(lib, names):
+    # builds the functions the compiled source calls, from a module's own trig/log functions
+    sin, cos, tan, sinh, cosh, tanh, asin, acos, atan, asinh, acosh, atanh, log, exp = (getattr(lib, n) for n in names)
+    return {
+        'sin': sin, 'cos': cos, 'tan': tan,
+        'csc': _reciprocal(sin), 'sec': _reciprocal(cos), 'cot': _reciprocal(tan),
+        'arcsin': asin, 'arccos': acos, 'arctan': atan,
+        'arccsc': _of_reciprocal(asin), 'arcsec': _of_reciprocal(acos), 'arccot': _of_reciprocal(atan),
+        'sinh': sinh, 'cosh': cosh, 'tanh': tanh,
+        'csch': _reciprocal(sinh), 'sech': _reciprocal(cosh), 'coth': _reciprocal(tanh),
+        'arcsinh': asinh, 'arccosh': acosh, 'arctanh': atanh,
+        'arccsch': _of_reciprocal(asinh), 'arcsech': _of_reciprocal(acosh), 'arccoth': _of_reciprocal(atanh),
+        'ln': log, 'exp': exp,
+    }
+
+def _math_root(x, n):
+    # the real nth-root; odd roots of negatives are negative
+    if x < 0 and n % 2:
+        return -(-x)**(1/n)
+    return x**(1/n) if x >= 0 else math.nan
+
+def _numpy_root(x, n):
+    if n % 2:
+        return np.sign(x) * np.abs(x)**(1/n)
+    return np.power(x, 1/n)
+
+BACKENDS = {
+    'math': dict(_namespace(math, ('sin', 'cos', 'tan', 'sinh', 'cosh', 'tanh', 'asin', 'acos', 'atan',
+                                   'asinh', 'acosh', 'atanh', 'log', 'exp')), root=_math_root),
+}
+
+@functools.lru_cache(maxsize=None) # only tries once
+def load_numpy():
+    """Imports NumPy and adds the 'numpy' backend; returns whether it's available
+
+    Importing NumPy takes longer than the rest of the package, so it's put off until an expression
+    is first compiled"""
+    global np
+    try:
+        import numpy as np
+    except ImportError:
+        return False
+    BACKENDS['numpy'] = dict(_namespace(np, ('sin', 'cos', 'tan', 'sinh', 'cosh', 'tanh', 'arcsin', 'arccos', 'arctan',
+                                             'arcsinh', 'arccosh', 'arctanh', 'log', 'exp')), root=_numpy_root)
+    return True
+
+@node_cache
+def source(node):
+    """Returns the Python source of a tree; computed once per distinct (sub)expression"""
+    kind = type(node)
+    if kind is Const:
+        return repr(node.value)
+    elif kind is Rational:
+        return f"({node.numer}/{node.denom})"
+    elif kind is Var:
+        return node.name
+    elif kind is Pow: # ** binds tighter than a sign and groups from the right, so the base is bracketed
+        base = node.base
+        if type(base) is Var or (type(base) is Const and base.value >= 0):
+            return f"{source(base)}**{node.exp}"
+        return f"({source(base)})**{node.exp}"
+    elif kind is Mul:
+        return '(' + '*'.join(map(source, node.factors)) + ')' if node.factors else '1'
+    elif kind is Add:
+        return '(' + '+'.join(map(source, node.terms)) + ')' if node.terms else '0'
+    elif kind is Div:
+        return f"({source(node.numer)}/{source(node.denom)})"
+    elif kind is Root:
+        return f"root({source(node.arg)}, {node.n})"
+    elif kind is Func:
+        if node.name.startswith('log-'): # log-b(x) is ln(x)/ln(b)
+            return f"(ln({source(node.arg)})/ln({float(node.name[4:])!r}))"
+        if node.name not in BACKENDS['math']:
+            raise ValueError(f"unknown function: {node.name}")
+        return f"{node.name}({source(node.arg)})"
+    raise TypeError(f"not an expression node: {node!r}")
+
+def indeterminants(node):
+    """Returns the names of the indeterminants in a tree, in alphabetical order"""
+    return ''.join(sorted({n.name for n in node.walk() if type(n) is Var}))
+
+@functools.lru_cache(maxsize=1024)
+def _compile(node, indets, backend):
+    namespace = dict(BACKENDS[backend])
+    code = f"lambda {', '.join(indets)}: {source(node)}"
+    return eval(compile(code, f"<{backend} expression>", 'eval'), namespace)
+
+def compile_expression(expression, indets=None, backend=None):
+    """Compiles an expression into a function of its indeterminants, e.g. f(x, y) for 'xy'
+
+    @expression: a Polynomial, Algebraic or Closeform instance, or an mpgNodes tree
+    @indets: the function's parameters, in order; defaults to the expression's indeterminants
+    @backend: 'numpy' (the default when installed) evaluates elementwise over arrays of sample points,
+              'math' evaluates plain floats
+
+    Points outside the domain (ln of negatives, even roots of negatives, poles) give nan or inf;
+    compiled functions are cached, so compiling the same tree again is free"""
+    if isinstance(expression, Node):
+        node = expression
+        indets = indets if indets is not None else indeterminants(node)
+    else:
+        node = expression.tree()
+        indets = indets if indets is not None else expression.indets
+    if backend in (None, 'numpy'):
+        available = load_numpy() # also when asked for by name, so it's loaded on first use
+        if backend is None:
+            backend = 'numpy' if available else 'math'
+    if backend not in BACKENDS:
+        raise ValueError(f"unavailable backend: {backend}")
+
+    missing = set(indeterminants(node)) - set(indets)
+    if missing:
+        raise ValueError(f"indeterminants missing from {indets!r}: {''.join(sorted(missing))}")
+
+    funct = _compile(node, tuple(indets), backend)
+    if backend == 'numpy':
+        return _numpy_function(funct)
+    return _math_function(funct)
+
+def _numpy_function(funct):
+    @functools.wraps(funct)
+    def evaluate(*args, **kwargs):
+        args = [np.asarray(a, dtype=float) for a in args]
+        kwargs = {k: np.asarray(v, dtype=float) for k, v in kwargs.items()}
+        with np.errstate(all='ignore'):
+            result = funct(*args, **kwargs)
+        values = args + list(kwargs.values())
+        if values and np.ndim(result) == 0: # constant expressions still give one value per point
+            result = np.full(np.broadcast(*values).shape, result, dtype=float)
+        return result
+    return evaluate
+
+def _math_function(funct):
+    @functools.wraps(funct)
+    def evaluate(*args, **kwargs):
+        try:
+            return float(funct(*args, **kwargs))
+        except (ValueError, ZeroDivisionError):
+            return math.nan
+        except OverflowError:
+            return math.inf
+    return evaluate
+
+def evaluate(expression, backend=None, **values):
+    """Evaluates an expression at a point (or arrays of points), e.g. evaluate(expr, x=1.5, y=[0, 1, 2])"""
+    return compile_expression(expression, ''.join(values), backend)(**values)
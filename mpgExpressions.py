@@ -3,9 +3,314 @@
 # description: this file contains the classes for each individual form of mathematical expressions, e.g. polynomial, algebraic, closeform, & mathematical
 #              each class has certain functions and attributes unit to it
 
-import random, itertools
+import collections, functools, random, time, warnings
+
+from mpgNodes import Add, Mul, Div, Pow, Var, Const, Func, Root, coefficient_node, tokens
+
+# the GenerationStats being recorded to while instrumentation is enabled; see enable_instrumentation()
+_STATS = None
+
+# the trigonometric and hyperbolic functions, and their inverses (arc-)
+TRIGS = ("sin", "cos", "tan", "csc", "cot", "sec")
+ARCTRIGS = ("arcsin", "arccos", "arctan", "arccsc", "arccot", "arcsec")
+HYPERS = ("sinh", "cosh", "tanh", "csch", "coth", "sech")
+ARCHYPERS = ("arcsinh", "arccosh", "arctanh", "arccsch", "arccoth", "arcsech")
+
+# the closed-form function terms of each (trig, log, expo) setting: the builders, in the order they draw
+# from the random source, and the order the terms go in; all False defaults to a trig function
+FUNCTION_PLANS = {
+    (True, True, True): (('get_trigfunct', 'get_log', 'get_expon'), (0, 1, 2)),
+    (True, True, False): (('get_trigfunct', 'get_log'), (0, 1)),
+    (True, False, True): (('get_expon', 'get_trigfunct'), (1, 0)),
+    (True, False, False): (('get_trigfunct',), (0,)),
+    (False, True, True): (('get_log', 'get_expon'), (0, 1)),
+    (False, True, False): (('get_log',), (0,)),
+    (False, False, True): (('get_expon',), (0,)),
+    (False, False, False): (('get_trigfunct',), (0,)),
+}
+
+def package_coefficient(value1, value2=0):
+    """Packages the values into a coefficient list, e.g. ['+', 3] or ['-', 3, '/', 4]"""
+    sign = lambda x : '+' if x >= 0 else '-' # determines the sign of the coefficient
+    if value2 == 0: # if value2 is 0, then the coefficient is a whole number integer
+        return [sign(value1), abs(value1)] # splits sign of integer and the value for parsing later
+    return [sign(value2), abs(value1), '/', abs(value2)]
+
+class CoefficientSampler:
+    """Draws randomized coefficients from an integer range [lowbound, highbound)
+
+    Values are drawn straight from the range, so no temporary sample list is built
+    per coefficient; use coefficient_sampler() to get a shared instance"""
+
+    __slots__ = ('lowbound', 'highbound', 'widened')
+
+    def __init__(self, lowbound=-10, highbound=10):
+        if lowbound > highbound:
+            lowbound, highbound = highbound, lowbound
+
+        # the range must be able to hold a sample of the mean of the bounds; else it's widened
+        mean_value = round((abs(lowbound) + abs(highbound))/2)
+        self.widened = mean_value > highbound - lowbound
+        if self.widened: # warned once per range, since samplers are shared; counted per use, in coefficients()
+            warnings.warn(f"coefficient range too small, using {lowbound*5}, {highbound*5}", RuntimeWarning, stacklevel=3)
+            lowbound, highbound = lowbound*5, highbound*5
+        if highbound <= lowbound:
+            raise ValueError(f"empty coefficient range: {lowbound}, {highbound}")
+        if (lowbound, highbound) == (0, 1): # denominators are redrawn until non-zero, which would never happen
+            raise ValueError(f"no non-zero coefficients in range: {lowbound}, {highbound}")
+
+        self.lowbound = lowbound
+        self.highbound = highbound
+
+    def __repr__(self):
+        return f"CoefficientSampler(lowbound={self.lowbound}, highbound={self.highbound})"
+
+    def value(self, rng=random):
+        """Returns a random integer from the range
+        @rng: the random source; a random.Random instance or the random module"""
+        return rng.randrange(self.lowbound, self.highbound)
+
+    def coefficient(self, rng=random):
+        """Returns a single packaged coefficient; integers are favored 60%, 1/value
+        fractions 20% and value/value fractions 20%"""
+        randval = rng.randint(0, 4) # determines if coeff will be integer or fraction
+
+        if randval > 1: # 60% favor to integers
+            coeff = rng.choice((self.value(rng), 0))
+            return package_coefficient(coeff)
+        elif randval == 0: # 20% for a 1/value fraction
+            denom = self.value(rng)
+            while denom == 0: # prevents value/0 forms
+                if _STATS is not None:
+                    _STATS.count('zero_denominator_retry')
+                denom = self.value(rng)
+            if abs(denom) == 1:
+                return package_coefficient(1)
+            return package_coefficient(1, denom)
+        else: # 20% for value/value fraction
+            numer = self.value(rng)
+            denom = self.value(rng)
+            while denom == 0: # prevents value/0 forms
+                if _STATS is not None:
+                    _STATS.count('zero_denominator_retry')
+                denom = self.value(rng)
+            if numer == 0: # prevents 0/value forms; returns 0 coeff
+                return package_coefficient(0)
+            elif abs(numer) == abs(denom): # prevents a/a value forms; returns 1
+                return package_coefficient(1)
+            else:
+                return package_coefficient(numer, denom) # returns a/b form
+
+    def coefficients(self, degree, rng=random):
+        """Returns a list of degree+1 coefficients, the first of which is non-zero"""
+        if self.widened and _STATS is not None:
+            _STATS.count('range_widened')
+        coeffs = [self.coefficient(rng) for _ in range(degree+1)]
+        if coeffs[0][1] == 0: # prevent first element from being 0
+            coeffs[0][1] = 1
+        return coeffs
+
+@functools.lru_cache(maxsize=64)
+def coefficient_sampler(lowbound=-10, highbound=10):
+    """Returns a shared CoefficientSampler for the range; samplers are kept in a bounded LRU cache"""
+    return CoefficientSampler(lowbound, highbound)
+
+class SubsetSampler:
+    """Draws random non-empty subsets of a string of indeterminants, e.g. ('x', 'z') from 'xyz',
+    without listing all 2**n - 1 of them; use subset_sampler() to get a shared instance
+
+    Subsets are numbered by bitmask, 1 to 2**n - 1, and built on first use"""
+
+    __slots__ = ('indets', 'count', '_subsets')
+
+    def __init__(self, indets):
+        self.indets = indets
+        self.count = (1 << len(indets)) - 1 # the number of non-empty subsets
+        self._subsets = {}
+
+    def __repr__(self):
+        return f"SubsetSampler(indets={self.indets!r})"
+
+    def subset(self, mask):
+        """Returns the subset numbered by a bitmask, as a tuple in indeterminant order"""
+        subset = self._subsets.get(mask)
+        if subset is None:
+            subset = self._subsets[mask] = tuple(v for i, v in enumerate(self.indets) if mask >> i & 1)
+        return subset
+
+    def draw(self, k, rng=random):
+        """Returns k random subsets, all distinct; if k is more than there are, the subsets
+        run out in random order and the last one repeats"""
+        if k < self.count:
+            masks = rng.sample(range(1, self.count + 1), k)
+        else:
+            masks = rng.sample(range(1, self.count + 1), self.count)
+            masks.extend([masks[-1]] * (k - self.count))
+        return [self.subset(mask) for mask in masks]
+
+@functools.lru_cache(maxsize=64)
+def subset_sampler(indets):
+    """Returns a shared SubsetSampler for a string of indeterminants (bounded LRU cache)"""
+    return SubsetSampler(indets)
+
+class PolynomialPlan:
+    """The parts of the polynomials of one configuration that don't change between them: the samplers,
+    every power of each indeterminant up to the degree, and the nodes of the coefficients drawn so far;
+    generating fills only the random choices in. Use polynomial_plan() to get a shared instance"""
+
+    __slots__ = ('sampler', 'subsets', 'powers', 'coefficients')
+
+    MAX_COEFFICIENTS = 4096 # coefficient nodes kept per plan
+
+    def __init__(self, degree, indeterminants, lowbound, highbound):
+        self.sampler = coefficient_sampler(lowbound, highbound)
+        self.subsets = subset_sampler(indeterminants)
+        self.powers = {t: tuple(Pow(Var(t), d) for d in range(degree + 1)) for t in indeterminants}
+        self.coefficients = {}
+
+    def __repr__(self):
+        return f"PolynomialPlan(sampler={self.sampler!r}, subsets={self.subsets!r})"
+
+    def coefficient(self, coeff):
+        """Returns the node of a coefficient list, e.g. ['-', 3, '/', 4]"""
+        key = tuple(coeff)
+        node = self.coefficients.get(key)
+        if node is None:
+            node = coefficient_node(coeff)
+            if len(self.coefficients) < self.MAX_COEFFICIENTS:
+                self.coefficients[key] = node
+        return node
+
+@functools.lru_cache(maxsize=256)
+def polynomial_plan(degree, indeterminants='x', lowbound=-10, highbound=10):
+    """Returns the shared PolynomialPlan of a configuration (bounded LRU cache)"""
+    return PolynomialPlan(degree, indeterminants, lowbound, highbound)
+
+def polynomial_tree(degree, indeterminants='x', lowbound=-10, highbound=10, rng=random):
+    """Builds the tree of a random polynomial; Polynomial.new and the algebraic and closeform
+    expressions all build through this, from the configuration's shared plan, rather than
+    making Polynomial objects
+
+    Coefficients are drawn from [lowbound, highbound), the bounds the expression was configured
+    with; before this function, Polynomial.new drew from the default range whatever they were"""
+    plan = polynomial_plan(degree, indeterminants, lowbound, highbound)
+    coeffs = [plan.coefficient(c) for c in plan.sampler.coefficients(degree, rng)]
+
+    # randomly selects distinct combination subsets of the indeterminants for the form of the expression,
+    # drawn directly rather than from a list of every combination
+    subsets = plan.subsets.draw(degree, rng)
+
+    # randomly generates a degree between 0 and degree (highest degree in expression) for each indeterminant in it
+    degrees = [rng.randint(0, degree) for _ in range(sum(map(len, subsets)))]
+
+    # ensures the expression will have the passed degree
+    if degree not in degrees:
+        degrees.insert(0, degree)
+
+    # combines the terms and the degrees into subterms
+    degree_iter, powers = iter(degrees), plan.powers
+    subterms = [tuple(powers[t][next(degree_iter)] for t in ss) for ss in subsets]
+
+    # builds the expression; combines the coeffs and the subterms, then the ending coefficient (the intercept)
+    terms = [Mul((coeff,) + subterm) for coeff, subterm in zip(coeffs, subterms)]
+    terms.append(coeffs[-1])
+    return Add(tuple(terms))
+
+def algebraic_tree(context):
+    """Builds the tree of a random algebraic expression from the attributes of context: an Algebraic,
+    or a Closeform in algebraic form, whose degree, indets, bounds, root, rational, proper and rng are used"""
+    polynomial = lambda degree : polynomial_tree(degree, context.indets, context.lowbound, context.highbound, context.rng)
+    less_degree = lambda : context.rng.randint(0, context.degree-1) if context.degree > 1 else 0
+
+    # if rational is true, then the expression is a rational function
+    # if proper is true, then it's a proper rational function; P(x)/Q(x) where P(x) < Q(x)
+    if context.rational and context.proper:
+        Q_funct = polynomial(context.degree)
+
+        # if root is greater than one, an nth-root will replace P_funct; it could be a value or polynomial,
+        # which is only built if it's used
+        if context.root > 1:
+            P_funct = context.get_nthroot(context.root, expression=lambda : polynomial(context.degree))
+        else:
+            P_funct = polynomial(less_degree())
+        return Div(P_funct, Q_funct)
+
+    # if proper is false, then it's an improper rational function; Q(x)/P(x) where P(x) < Q(x)
+    elif context.rational and not context.proper:
+        Q_funct = polynomial(context.degree)
+
+        if context.root > 1:
+            P_funct = context.get_nthroot(context.root, expression=lambda : polynomial(context.degree))
+        else:
+            P_funct = polynomial(less_degree())
+        return Div(Q_funct, P_funct)
+
+    # otherwise it's the nth-root of a polynomial
+    return context.get_nthroot(context.root, function=True, expression=polynomial(context.degree))
 
 class Expression:
+
+    def __init__(self, rng=None, lazy=False, simplify=False):
+        # the random source; passing a random.Random gives the expression its own stream,
+        # independent of the global random state and of other expressions
+        self.rng = random if rng is None else rng
+        # new() simplifies what it makes; see mpgSimplify. Simplified trees don't keep the generated shape,
+        # so neither does __call__: a single surviving term or number comes back bare rather than in a list,
+        # and folded **1 powers lose their '**', 1 (['x'] for ['x', '**', 1], 'sin', '(' for 'sin', '**', 1, '(')
+        self.simplify = simplify
+        # in lazy mode, constructing makes nothing and new() only draws a seed; the tree is built
+        # from the seed on first use, with the attributes as they are then. It's the tree an eager
+        # expression makes with random.Random(seed), so not the one it makes with the same rng
+        self.lazy = lazy
+        self._seed = None
+        self._pending = lazy
+
+    def _defer(self):
+        # new() calls this first; in lazy mode it records the seed of the next tree and returns True
+        if not self.lazy:
+            return False
+        self._seed = self.rng.getrandbits(64)
+        self._pending = True
+        return True
+
+    def _finish(self, tree):
+        # new() sets the expression to this
+        if not self.simplify:
+            return tree
+        from mpgSimplify import simplify
+        return simplify(tree)
+
+    def _build(self):
+        # builds a lazy expression's pending tree from its seed
+        if self._seed is None: # nothing drawn since construction
+            self._seed = self.rng.getrandbits(64)
+        rng, self.rng, self.lazy = self.rng, random.Random(self._seed), False
+        try:
+            self.new()
+        finally:
+            self.rng, self.lazy = rng, True
+        self._pending = False
+
+    def spec(self):
+        """Returns the ExpressionSpec of a lazy expression: its class, attributes and seed, which
+        rebuild its tree exactly; eager trees aren't built from a seed of their own, so have none"""
+        if not self.lazy:
+            raise ValueError("only lazy expressions record the seed of their tree")
+        if self._seed is None:
+            self._seed = self.rng.getrandbits(64)
+        params = tuple((name, getattr(self, name)) for name in self.ATTRIBUTES if hasattr(self, name))
+        return ExpressionSpec(type(self).__name__, params, self._seed)
+
+    def __getstate__(self):
+        # the random module can't be pickled; it's restored as the random source on unpickling
+        state = self.__dict__.copy()
+        if state.get('rng') is random:
+            del state['rng']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__dict__.setdefault('rng', random)
     
     def get_coefficients(self, degree, lowbound=-10, highbound=10):
         """Creates randomized coefficients for expressions within a range,
@@ -16,127 +321,91 @@ class Expression:
         Lowbound param should be lower than highbound param, but the function
         will correct for this if not"""
 
-        def package(value1, value2=0): # packages the values into coeff list for the return
-            sign = lambda x : '+' if x >= 0 else '-' # determines the sign of the coefficient
-            if value2 == 0: # if value2 is 0, then the coefficient is a whole number integer
-                return [sign(value1), abs(value1)] # splits sign of integer and the value for parsing later
-            return [sign(value2), abs(value1), '/', abs(value2)]
-        
-        def create_coefficient(lowbound, highbound):
-            # creates a sample of integers to pull from
-            try:
-                mean_value = round((abs(lowbound) + abs(highbound))/2)
-                values = random.sample(range(lowbound, highbound), mean_value)
-            except ValueError: # random.sample will raise ValueError is k (mean_value) is greater than the range
-                print(f"Error: range too small, using {lowbound*5}, {highbound*5}")
-                values = random.sample(range(lowbound*5, highbound*5), 5)
-
-            # lambda function to get a random value from the values sample   
-            get_value = lambda : values[random.randint(0, len(values)-1)]
-
-            randval = random.randint(0, 4) # determines if coeff will be integer or fraction
-
-            if randval > 1: # 60% favor to integers
-                coeff = random.choice((get_value(), 0))
-                return package(coeff)
-            else:
-                if randval == 0: # 20% for a 1/value fraction
-                    denom = get_value()
-                    while True: # prevents value/0 forms
-                        if denom == 0:
-                            denom = get_value()
-                        else:
-                            break
-                    if abs(denom) == 1:
-                        return package(1)
-                    return package(1, denom)
-                else: # 20% for value/value fraction
-                    numer = get_value()
-                    denom = get_value()
-                    while True: # prevents value/0 forms
-                        if denom == 0:
-                            denom = get_value()
-                        else:
-                            break
-                    if numer == 0: # prevents 0/value forms; returns 0 coeff
-                        return package(0)
-                    elif abs(numer) == abs(denom): # prevents a/a value forms; returns 1
-                        return package(1)
-                    else:
-                        return package(numer, denom) # returns a/b form
-
         if lowbound > highbound:
             lowbound, highbound = highbound, lowbound
 
-        coeffs = []
-        for d in range(degree+1):
-            coeff = create_coefficient(lowbound, highbound)
-            if d == 0 and coeff[1] == 0: # prevent first element from being 0
-                coeff[1] = 1
-            coeffs.append(coeff)
-        return coeffs
+        return coefficient_sampler(lowbound, highbound).coefficients(degree, self.rng)
+
+    def get_coefficients_batch(self, n_expressions, degree, lowbound=-10, highbound=10, rng=None):
+        """Creates the coefficients of n_expressions expressions at once, as a NumPy structured
+        array of (sign, numer, denom) records with shape (n_expressions, degree+1)
+
+        Requires NumPy; see mpgBatch.get_coefficients_batch"""
+        from mpgBatch import get_coefficients_batch
+        return get_coefficients_batch(n_expressions, degree, lowbound, highbound, rng)
+
 
+    def compile(self, backend=None):
+        """Compiles the expression into a fast numeric function of its indeterminants, which
+        evaluates over NumPy arrays of points; see mpgEvaluate.compile_expression"""
+        from mpgEvaluate import compile_expression
+        return compile_expression(self, backend=backend)
+
+    def derivative(self, indeterminant=None):
+        """Returns the derivative of the expression (by default with respect to its first
+        indeterminant) as a tree; see mpgSolve.derivative"""
+        from mpgSolve import derivative
+        return derivative(self, indeterminant)
+
+    def antiderivative(self, indeterminant=None):
+        """Returns an antiderivative of the expression as a tree, or None if no closed form
+        is known; see mpgSolve.antiderivative"""
+        from mpgSolve import antiderivative
+        return antiderivative(self, indeterminant)
+
+    def render(self, fmt='latex'):
+        """Returns the expression rendered as 'latex', 'plain' text or 'mathml'; see mpgRender.render"""
+        from mpgRender import render
+        return render(self, fmt)
+
+    def difficulty(self):
+        """Returns the difficulty of the expression, 1 (easiest) to 10, from its structure; see mpgDifficulty"""
+        from mpgDifficulty import difficulty
+        return difficulty(self)
 
     def get_nthroot(self, root, function=False, expression=None):
-        """ Creates an nth-root expression, of either a coefficient or an expression"""
-        if function:
-            radicand = expression        
-        elif random.randint(0, 2) >= 1 :
-            radicand = expression        
+        """ Creates an nth-root term, of either a coefficient or an expression (a node, or a function
+            that builds one, which is only called if the expression is used)"""
+        if function or self.rng.randint(0, 2) >= 1:
+            radicand = expression() if callable(expression) else expression
         else:
-            radicand = self.get_coefficients(0, 1, 10)
+            radicand = Add((coefficient_node(self.get_coefficients(0, 1, 10)[0]),))
 
-        coeff = self.get_coefficients(0, -10, 10)[0] # should return a single coefficient
-        nthroot = str(root) + "-root"
-        [coeff, nthroot, '(', radicand, ')']
-        return [coeff, nthroot, '(', radicand, ')']
+        coeff = coefficient_node(self.get_coefficients(0, -10, 10)[0]) # should return a single coefficient
+        return Mul((coeff, Root(root, radicand)))
 
     def get_trigfunct(self, indeterminant=None, degree=1, inverse=False, hyperbolic=False, function=False, expression=None):
-        """ Creates a trigonometric function, including inverse and hyperbolic forms, and can
-            use an expression"""
-        # Collections of the trigonometric and hyperbolic functions, and their inverses (arc-)
-        trigs = ["sin", "cos", "tan", "csc", "cot", "sec"]
-        arctrigs = ["arcsin", "arccos", "arctan", "arccsc", "arccot", "arcsec"]
-        hypers = ["sinh", "cosh", "tanh", "csch", "coth", "sech"]
-        archypers = ["arcsinh" "arccosh", "arctanh", "arccsch", "arccoth", "arcsech"]
-
-        # A lambda function for getting a random function from a list above
-        get_funct = lambda lst : lst[random.randrange(0, len(lst))]
-
-        # Determining which list to pull from
+        """ Creates a trigonometric function term, including inverse and hyperbolic forms, and can
+            use an expression (a node)"""
+        # Determining which of the function tuples to pull from
         if inverse:
-            if hyperbolic:
-                funct = get_funct(archypers)
-            else:
-                funct = get_funct(arctrigs)
+            functs = ARCHYPERS if hyperbolic else ARCTRIGS
         else:
-            if hyperbolic:
-                funct = get_funct(hypers)
-            else:
-                funct = get_funct(trigs)
+            functs = HYPERS if hyperbolic else TRIGS
+        funct = functs[self.rng.randrange(0, len(functs))]
 
         # Determining what will go inside the function
         if function:
             inside = expression
         elif indeterminant is not None:
-            inside = indeterminant
+            inside = Var(indeterminant)
         else:
-            inside = random.randrange(0, 10)
+            inside = Const(self.rng.randrange(0, 10))
 
-        coeff = self.get_coefficients(0, -10, 10)[0]
+        coeff = coefficient_node(self.get_coefficients(0, -10, 10)[0])
 
-        return [coeff, funct, "**", degree, "(", inside, ")"]
+        return Mul((coeff, Pow(Func(funct, inside), degree)))
 
     def get_log(self, indeterminant=None, base=None, function=False, expression=None):
-        """ Returns an logarithm, either natural or with a base, of some value or expression"""
+        """ Returns a logarithm term, either natural or with a base, of some value or expression"""
 
         # Determines the inside of the function
         if function:
             inside = expression
         elif indeterminant is not None:
-            inside = indeterminant
+            inside = Var(indeterminant)
         else:
-            inside = random.randrange(0, 10)
+            inside = Const(self.rng.randrange(0, 10))
 
         # Defaults to base e, the natural logarithm (ln)
         if base is not None:
@@ -144,117 +413,75 @@ class Expression:
         else:
             log = "ln"
         
-        coeff = self.get_coefficients(0, -10, 10)[0]
-        return [coeff, log, '(', inside, ')']
+        coeff = coefficient_node(self.get_coefficients(0, -10, 10)[0])
+        return Mul((coeff, Func(log, inside)))
 
     def get_expon(self, indeterminant=None, function=False, expression=None):
-        """ Returns an exponential function (e times something)"""
+        """ Returns an exponential function term (e times something)"""
         
         # Determines the exponent
         if function:
             exponent = expression
         elif indeterminant is not None:
-            exponent = indeterminant
+            exponent = Var(indeterminant)
         else:
-            exponent = random.randrange(0, 10)
+            exponent = Const(self.rng.randrange(0, 10))
         
-        coeff = self.get_coefficients(0, -10, 10)[0]
-        return [coeff, 'e**', exponent]
+        coeff = coefficient_node(self.get_coefficients(0, -10, 10)[0])
+        return Mul((coeff, Func('exp', exponent)))
 
 class Polynomial(Expression):
 
-    def __init__(self, degree=1, indeterminants='x', lowbound=-10, highbound=10):
-        super()
+    ATTRIBUTES = ('degree', 'indets', 'lowbound', 'highbound', 'simplify') # what an ExpressionSpec records
+
+    def __init__(self, degree=1, indeterminants='x', lowbound=-10, highbound=10, rng=None, lazy=False, simplify=False):
+        super().__init__(rng, lazy, simplify)
         self.degree = degree
         self.indets = indeterminants
         self.lowbound = lowbound
         self.highbound = highbound
-        self.__expression = []
+        self.__expression = Add(())
 
-        self.new()
+        if not lazy:
+            self.new()
 
     def __repr__(self):
         return f"Poloynomial(degree={self.degree}, lowbound={self.lowbound}, highbound={self.highbound})"
 
     def __call__(self):
+        return tokens(self.tree())
+
+    def tree(self):
+        """Returns the expression as a tree of mpgNodes nodes"""
+        if self._pending:
+            self._build()
         return self.__expression
 
     def new(self):
 
         """Creates a polynomial expression using the set attributes"""
-        self.__expression = []
-        coeffs = self.get_coefficients(self.degree)
-
-        if self.degree == 0:
-            self.__expression.append(coeffs)
-
-        # a list of all combinations of the interdetermines (minus the empty set)
-        indets_subset = []
-        for v in range(0, len(self.indets)+1):
-            for subset in itertools.combinations(self.indets, v):
-                indets_subset.append(subset)
-        indets_subset.pop(0)
-
-        # gets a random subset if there's most than one; else returns the single subset
-        def get_subset():
-            if len(indets_subset) == 1:
-                subset = indets_subset[0]
-            else:
-                index = random.randint(0, len(indets_subset)-1)
-                subset = indets_subset[index]
-                indets_subset.pop(index)
-            return subset
-
-        # randomly generates each subterm of the expression using the indeterminants and degrees
-        def get_subterms():
-            form = []
-            subsets = []
-            lens_subsets = 0
-            # generates a random degree between 0 and degree (highest degree in expression)
-            get_degree = lambda : random.randint(0, self.degree)
-        
-            # randomly selects the combination subsets of the indeterminants for the form of the expression
-            # also calculates the total number of indeterminants, for use in calculating needed degrees
-            for _ in range(self.degree):
-                subset = get_subset()
-                lens_subsets += len(subset)
-                subsets.append(subset)
-            
-            # randomly generates the degrees needed for each indeterminant in the expression
-            degrees = []
-            for _ in range(lens_subsets):
-                degrees.append(get_degree())
-
-            # ensures the expression will have the passed degree
-            if self.degree not in degrees:
-                degrees.insert(0, self.degree)
-
-            # combines the terms and the degrees into subterms
-            degree_counter = 0
-            for ss in subsets:
-                term = []
-                for i in range(len(ss)):
-                    t = ss[i]
-                    degr = degrees[degree_counter]
-                    term.extend([t, "**", degr])
-                    degree_counter += 1
-                form.append(term)
-            return form
-        
-        # builds the expression; combines the coeffs and the subterms
-        self.__expression = list(zip(coeffs, get_subterms()))
-        self.__expression.append(coeffs[-1]) # inputs the ending coefficient (the intercept)
-
-    def random(self):
-        """Generates a random expression using random degree and indeterminants"""
-        self.degree = random.randint(1, 5)
-        self.indets = random.choice(['x', 'xy', 'xyz', 'wxyz'])
+        if self._defer():
+            return
+        self.__expression = self._finish(polynomial_tree(self.degree, self.indets, self.lowbound, self.highbound, self.rng))
+
+    def random(self, difficulty=None):
+        """Generates a random expression using random degree and indeterminants
+        @difficulty: if given, 1 (easiest) to 10; only attributes making expressions that hard are drawn"""
+        if difficulty is not None: # draws attributes of that difficulty instead; see mpgDifficulty
+            from mpgDifficulty import configure
+            configure(self, difficulty)
+            return self.new()
+        self.degree = self.rng.randint(1, 5)
+        self.indets = self.rng.choice(['x', 'xy', 'xyz', 'wxyz'])
         self.new()
 
 class Algebraic(Expression):
+
+    ATTRIBUTES = ('degree', 'indets', 'lowbound', 'highbound', 'root', 'rational', 'proper', 'simplify')
     
-    def __init__(self, degree=1, indeterminants='x', lowbound=-10, highbound=10, root=1, rational=True, proper=True):
-        super()
+    def __init__(self, degree=1, indeterminants='x', lowbound=-10, highbound=10, root=1, rational=True, proper=True, rng=None,
+                 lazy=False, simplify=False):
+        super().__init__(rng, lazy, simplify)
         self.degree = degree
         self.indets = indeterminants
         self.lowbound = lowbound
@@ -262,75 +489,50 @@ class Algebraic(Expression):
         self.root = root
         self.rational = rational
         self.proper = proper
-        self.__expression = []
+        self.__expression = Add(())
         
-        self.new()
+        if not lazy:
+            self.new()
 
     def __repr__(self):
         return f"""Algebraic(degree={self.degree}, indeterminants={self.indets}, lowbound={self.lowbound},
             highbound={self.highbound}, rational={self.rational}, root={self.root})"""
 
     def __call__(self):
+        return tokens(self.tree())
+
+    def tree(self):
+        """Returns the expression as a tree of mpgNodes nodes"""
+        if self._pending:
+            self._build()
         return self.__expression
 
     def new(self):
         """Creates an algebraic expression using the set attributes"""
-        self.__expression = []
-        less_degree = lambda : random.randint(0, self.degree-1) if self.degree > 1 else 0
-
-        # if self.rational is true, then the expression is a rational function
-        # if self.proper is true, then it's a proper rational function; P(x)/Q(x) where P(x) < Q(x)
-        if self.rational and self.proper:
-
-            Q_funct = Polynomial(degree=self.degree, indeterminants=self.indets, 
-                            lowbound=self.lowbound, highbound=self.highbound)
-        
-            # if root is greater than one, an nth-root will replace P_funct; it could be a value or Polynomial
-            if self.root > 1:
-                expr = Polynomial(degree=self.degree, indeterminants=self.indets, 
-                            lowbound=self.lowbound, highbound=self.highbound)
-
-                P_funct = self.get_nthroot(self.root, expression = expr())
-                self.__expression = [P_funct, "/", Q_funct()]
-            else:  
-                P_funct = Polynomial(degree=less_degree(), indeterminants=self.indets, 
-                                lowbound=self.lowbound, highbound=self.highbound)
-                self.__expression = [P_funct(), "/", Q_funct()]
-
-        # if self.proper is false, then it's an improper rational function; Q(x)/P(x) where P(x) < Q(x)
-        elif self.rational and not self.proper:
-
-            Q_funct = Polynomial(degree=self.degree, indeterminants=self.indets, 
-                lowbound=self.lowbound, highbound=self.highbound)
-            
-            # if root is greater than one, an nth-root will replace P_funct; it could be a value or Polynomial
-            if self.root > 1:
-                expr = Polynomial(degree=self.degree, indeterminants=self.indets, 
-                            lowbound=self.lowbound, highbound=self.highbound)
-                P_funct = self.get_nthroot(self.root, expression=expr())
-                self.__expression = [Q_funct(), "/", P_funct]
-            else:  
-                P_funct = Polynomial(degree=less_degree(), indeterminants=self.indets, 
-                                lowbound=self.lowbound, highbound=self.highbound)
-                self.__expression = [Q_funct(), "/", P_funct()]
-
-        else:
-            # if root is greater than one, an nth-root will replace P_funct; it could be a value or Polynomial
-            Q_funct = Polynomial(degree=self.degree, indeterminants=self.indets, 
-                lowbound=self.lowbound, highbound=self.highbound)
-            
-            self.__expression = self.get_nthroot(self.root, function=True, expression=Q_funct())
-
-    def random(self):
-        """Generates a random expression using random attributes"""
-        self.degree = random.randint(1, 5)
-        self.root = random.choices([random.randint(5, 10), 4, 3, 2], cum_weights=[5, 15, 35, 89])[0]
-        self.indets = random.choice(['x', 'xy', 'xyz', 'wxyz'])
+        if self._defer():
+            return
+        self.__expression = self._finish(algebraic_tree(self))
+
+    def random(self, difficulty=None):
+        """Generates a random expression using random attributes
+        @difficulty: if given, 1 (easiest) to 10; only attributes making expressions that hard are drawn"""
+        if difficulty is not None: # draws attributes of that difficulty instead; see mpgDifficulty
+            from mpgDifficulty import configure
+            configure(self, difficulty)
+            return self.new()
+        self.degree = self.rng.randint(1, 5)
+        self.root = self.rng.choices([self.rng.randint(5, 10), 4, 3, 2], cum_weights=[5, 15, 35, 89])[0]
+        self.indets = self.rng.choice(['x', 'xy', 'xyz', 'wxyz'])
         self.new()
 
 class Closeform(Expression):
+
+    ATTRIBUTES = ('degree', 'indets', 'lowbound', 'highbound', 'trig', 'log', 'expo', 'albool', 'root', 'rational', 'proper',
+                  'simplify')
     
-    def __init__(self, degree=1, indeterminants='x', lowbound=-10, highbound=10, trig=True, log=False, expo=False, algebraic=False):
+    def __init__(self, degree=1, indeterminants='x', lowbound=-10, highbound=10, trig=True, log=False, expo=False, algebraic=False,
+                 rng=None, lazy=False, simplify=False):
+        super().__init__(rng, lazy, simplify)
         self.degree = degree
         self.indets = indeterminants
         self.lowbound = lowbound
@@ -338,11 +540,10 @@ class Closeform(Expression):
         self.trig = trig # include trig function?
         self.log = log # include logarithm?
         self.expo = expo # include exponential?
-        self.__expression = []
+        self.__expression = Add(())
         
         # Determines if the closeform expression will be an algebraic form or polynomial
         if algebraic is not False:
-            self.algebraic = algebraic
             self.albool = True
             self.root = algebraic[0]
             self.rational = algebraic[1]
@@ -350,88 +551,94 @@ class Closeform(Expression):
         else:
             self.albool = algebraic
 
-        self.new()
+        if not lazy:
+            self.new()
 
     def __repr__(self):
+        # the algebraic form as the constructor takes it; random() may have changed it since
+        algebraic = (self.root, self.rational, self.proper) if self.albool else False
         return f"""Closeform(degree={self.degree}, indeterminants={self.indets}, lowbound={self.lowbound},
-            highbound={self.highbound}, trig={self.trig}, log={self.log}, expo={self.expo}, algebraic={self.algebraic})"""
+            highbound={self.highbound}, trig={self.trig}, log={self.log}, expo={self.expo}, algebraic={algebraic})"""
              
     def __call__(self):
+        # the closed-form terms are appended to the algebraic or polynomial list, after their operator
+        expression = self.tree()
+        if self.simplify: # simplifying doesn't keep the shape the terms are spliced from
+            return tokens(expression)
+        if type(expression) is Mul and len(expression.factors) == 2:
+            op, (base, cf_funct) = ['*'], expression.factors
+        elif type(expression) is Div:
+            op, base, cf_funct = ['/'], expression.numer, expression.denom
+        elif type(expression) is Add and len(expression.terms) == 2:
+            op, (base, cf_funct) = [], expression.terms
+        else:
+            return tokens(expression)
+
+        if len(cf_funct.terms) == 1: # a single function is spliced in, rather than nested
+            cf_term = op + tokens(cf_funct.terms[0])
+        else:
+            cf_term = op + tokens(cf_funct)
+        result = tokens(base)
+        result.append(cf_term)
+        return result
+
+    def tree(self):
+        """Returns the expression as a tree of mpgNodes nodes"""
+        if self._pending:
+            self._build()
         return self.__expression
 
+    def get_functions(self):
+        """ Returns the tuple of closed-form function terms the set attributes call for"""
+
+        # Determines which closeform functions will be included, and the order they're drawn in, from the
+        # plan of the settings; if all attributes are False, then it defaults to a trig function regardless
+        builders, order = FUNCTION_PLANS[bool(self.trig), bool(self.log), bool(self.expo)]
+        indeterminant = self.indets[0]
+        terms = [getattr(self, builder)(indeterminant=indeterminant) for builder in builders]
+        return tuple(terms[i] for i in order)
+
     def new(self):
         """ Creates a closed-form expression consisting of trigonometric, logarithmic or exponential functions"""
-        
+        if self._defer():
+            return
+
         # For determining how the close-form expressions will be appended to the algebraic or polynomial expressions
-        # multiply, divide
-        cf_term = []
-        op = random.randint(0, 3)
-        if op == 0:
-            cf_term.append('*')
-        elif op == 1:
-            cf_term.append('/')
-
-        # Determines which closeform functions will be included; if all attributes are False, then it defaults to a trig function regardless
-        if self.trig:
-            if self.log:
-                if self.expo:
-                    trig = self.get_trigfunct(indeterminant=self.indets[0])
-                    log = self.get_log(indeterminant=self.indets[0])
-                    expo = self.get_expon(indeterminant=self.indets[0])
-                    cf_term.extend([trig, log, expo])
-                else:
-                    trig = self.get_trigfunct(indeterminant=self.indets[0])
-                    log = self.get_log(indeterminant=self.indets[0])
-                    cf_term.extend([trig, log])
+        # multiply, divide (or add, otherwise)
+        op = self.rng.randint(0, 3)
+        cf_funct = self.get_functions()
 
-            else:
-                if self.expo:
-                    expo = self.get_expon(indeterminant=self.indets[0])
-                    trig = self.get_trigfunct(indeterminant=self.indets[0])
-                    cf_term.extend([trig, expo])
-                else:
-                    trig = self.get_trigfunct(indeterminant=self.indets[0])
-                    cf_term.extend(trig)
+        # the closeform expression is its own context for the algebraic form, so no nested objects are made
+        if self.albool:
+            expr = algebraic_tree(self)
         else:
-            if self.log:
-                if self.expo:
-                    log = self.get_log(indeterminant=self.indets[0])
-                    expo = self.get_expon(indeterminant=self.indets[0])
-                    cf_term.extend([log, expo])
-                else:
-                    log = self.get_log(indeterminant=self.indets[0])
-                    cf_term.extend(log)
-            else:
-                if self.expo:
-                    expo = self.get_expon(indeterminant=self.indets[0])
-                    cf_term.extend(expo)
-                else:
-                    trig = self.get_trigfunct(indeterminant=self.indets[0])
-                    cf_term.extend(trig)
+            expr = polynomial_tree(self.degree, self.indets, self.lowbound, self.highbound, self.rng)
 
-        if self.albool:
-            expr = Algebraic(degree=self.degree, indeterminants=self.indets, 
-                        lowbound=self.lowbound, highbound=self.highbound, root=self.root, rational=self.rational, proper=self.proper)            
-            self.__expression = expr()
+        if op == 0:
+            expr = Mul((expr, Add(cf_funct)))
+        elif op == 1:
+            expr = Div(expr, Add(cf_funct))
         else:
-            expr = Polynomial(degree=self.degree, indeterminants=self.indets, 
-                        lowbound=self.lowbound, highbound=self.highbound)
-            self.__expression = expr()
-
-        self.__expression.append(cf_term)
-
-    def random(self):
-        """Generates a random expression using random attributes"""
-        self.degree = random.randint(1, 5)
-        self.indets = random.choice(['x', 'xy', 'xyz', 'wxyz'])
-        self.trig = random.choice([True, False])
-        self.log = random.choice([True, False])
-        self.expo = random.choice([True, False])
-        self.albool = random.choice([True, False])
+            expr = Add((expr, Add(cf_funct)))
+        self.__expression = self._finish(expr)
+
+    def random(self, difficulty=None):
+        """Generates a random expression using random attributes
+        @difficulty: if given, 1 (easiest) to 10; only attributes making expressions that hard are drawn"""
+        if difficulty is not None: # draws attributes of that difficulty instead; see mpgDifficulty
+            from mpgDifficulty import configure
+            configure(self, difficulty)
+            return self.new()
+        self.degree = self.rng.randint(1, 5)
+        self.indets = self.rng.choice(['x', 'xy', 'xyz', 'wxyz'])
+        self.trig = self.rng.choice([True, False])
+        self.log = self.rng.choice([True, False])
+        self.expo = self.rng.choice([True, False])
+        self.albool = self.rng.choice([True, False])
         if self.albool:
-            self.root = random.choices([random.randint(5, 10), 4, 3, 2], cum_weights=[5, 15, 35, 89])[0]
-            self.rational = random.choice([True, False])
-            self.proper = random.choice([True, False])
+            self.root = self.rng.choices([self.rng.randint(5, 10), 4, 3, 2], cum_weights=[5, 15, 35, 89])[0]
+            self.rational = self.rng.choice([True, False])
+            self.proper = self.rng.choice([True, False])
         self.new()
 
 class Mathematical(Expression):
@@ -439,6 +646,169 @@ class Mathematical(Expression):
     generated using the main program as a problem itself; is this for infinite series?"""
     pass
 
-exp = Closeform()
-exp.random()
-print(exp())
\ No newline at end of file
+class ExpressionSpec(collections.namedtuple('ExpressionSpec', ('kind', 'params', 'seed'))):
+    """The class name, attributes and seed of a lazy expression; a small tuple that can be stored
+    or sent to workers in place of the problem, and rebuilt into it anywhere
+
+    @kind: 'Polynomial', 'Algebraic' or 'Closeform'
+    @params: tuple of (attribute, value) pairs
+    @seed: the seed the tree is built from"""
+
+    __slots__ = ()
+
+    def build(self, rng=None):
+        """Returns a lazy expression whose tree is the one this spec was taken of
+        @rng: the random source of the expression's later new() and random() calls"""
+        kinds = {'Polynomial': Polynomial, 'Algebraic': Algebraic, 'Closeform': Closeform}
+        if self.kind not in kinds:
+            raise ValueError(f"unknown expression class: {self.kind}")
+        expression = kinds[self.kind](rng=rng, lazy=True)
+        for name, value in self.params:
+            setattr(expression, name, value)
+        expression._seed = self.seed
+        return expression
+
+class GenerationStats:
+    """Call counts and times of the instrumented generator functions, and counts of events
+    on their rare paths (zero-denominator retries, widened coefficient ranges)
+
+    Times are inclusive: Closeform.new counts the time of the get_* calls it makes"""
+
+    def __init__(self):
+        self.calls = {} # name -> number of calls
+        self.seconds = {} # name -> total seconds spent in calls
+        self.events = {} # event -> count
+        import threading # only needed once instrumenting; kept out of module startup
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"GenerationStats(calls={sum(self.calls.values())}, events={self.events})"
+
+    def record(self, name, seconds):
+        """Records a call to name that took seconds"""
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+            self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+
+    def count(self, event, n=1):
+        """Counts n occurrences of an event"""
+        with self._lock:
+            self.events[event] = self.events.get(event, 0) + n
+
+    def mean_seconds(self, name):
+        """Returns the mean time of a call to name, in seconds"""
+        calls = self.calls.get(name, 0)
+        return self.seconds.get(name, 0.0) / calls if calls else 0.0
+
+    def snapshot(self):
+        """Returns a copy of the statistics, as a dict of 'calls', 'seconds' and 'events' dicts"""
+        with self._lock:
+            return {'calls': dict(self.calls), 'seconds': dict(self.seconds), 'events': dict(self.events)}
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
+            self.seconds.clear()
+            self.events.clear()
+
+    def to_prometheus(self, prefix='mpg'):
+        """Returns the statistics in the Prometheus text exposition format"""
+        stats = self.snapshot()
+        lines = [
+            f"# HELP {prefix}_calls_total Calls to instrumented generator functions.",
+            f"# TYPE {prefix}_calls_total counter",
+        ]
+        lines += [f'{prefix}_calls_total{{function="{name}"}} {n}' for name, n in sorted(stats['calls'].items())]
+        lines += [
+            f"# HELP {prefix}_call_seconds_total Time spent in instrumented generator functions.",
+            f"# TYPE {prefix}_call_seconds_total counter",
+        ]
+        lines += [f'{prefix}_call_seconds_total{{function="{name}"}} {t!r}' for name, t in sorted(stats['seconds'].items())]
+        lines += [
+            f"# HELP {prefix}_events_total Retries and fallbacks taken while generating.",
+            f"# TYPE {prefix}_events_total counter",
+        ]
+        lines += [f'{prefix}_events_total{{event="{event}"}} {n}' for event, n in sorted(stats['events'].items())]
+        return '\n'.join(lines) + '\n'
+
+# the functions timed while instrumentation is enabled, as (class, attribute); None is this module
+INSTRUMENTED = (
+    (Expression, 'get_coefficients'),
+    (CoefficientSampler, 'coefficient'),
+    (Expression, 'get_trigfunct'),
+    (Expression, 'get_log'),
+    (Expression, 'get_expon'),
+    (Expression, 'get_nthroot'),
+    (Polynomial, 'new'),
+    (Algebraic, 'new'),
+    (Closeform, 'new'),
+    (None, 'polynomial_tree'),
+    (None, 'algebraic_tree'),
+)
+_originals = {}
+
+def _timed(name, function, stats):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            stats.record(name, time.perf_counter() - start)
+    return wrapper
+
+def enable_instrumentation(stats=None):
+    """Starts counting and timing the generator functions in INSTRUMENTED, and the retries and
+    fallbacks taken while generating; returns the GenerationStats recorded to
+
+    The functions are only wrapped while enabled, so there's no overhead when it's off.
+    Instrumentation is per process; worker processes aren't instrumented"""
+    global _STATS
+    disable_instrumentation()
+    _STATS = stats if stats is not None else GenerationStats()
+    namespace = globals()
+    for owner, attr in INSTRUMENTED:
+        if owner is None:
+            function, name = namespace[attr], attr
+            namespace[attr] = _timed(name, function, _STATS)
+        else:
+            function, name = owner.__dict__[attr], f"{owner.__name__}.{attr}"
+            setattr(owner, attr, _timed(name, function, _STATS))
+        _originals[owner, attr] = function
+    return _STATS
+
+def disable_instrumentation():
+    """Stops instrumenting, restoring the original functions; returns the GenerationStats
+    that were recorded to, or None if instrumentation wasn't enabled"""
+    global _STATS
+    namespace = globals()
+    for (owner, attr), function in _originals.items():
+        if owner is None:
+            namespace[attr] = function
+        else:
+            setattr(owner, attr, function)
+    _originals.clear()
+    stats, _STATS = _STATS, None
+    return stats
+
+def instrumentation_stats():
+    """Returns the GenerationStats being recorded to, or None if instrumentation is off"""
+    return _STATS
+
+class instrumented:
+    """A context manager; instruments the generators for the duration of a with block, e.g.
+    with instrumented() as stats: ..."""
+
+    def __init__(self, stats=None):
+        self.stats = stats
+
+    def __enter__(self):
+        return enable_instrumentation(self.stats)
+
+    def __exit__(self, *exc_info):
+        disable_instrumentation()
+
+if __name__ == '__main__': # an example; importing the module generates nothing
+    exp = Closeform()
+    exp.random()
+    print(exp())
@@ -0,0 +1,196 @@
+# description: numeric answer checking; each problem's solution is fingerprinted by its values at a
+#              seeded set of sample points inside the domain of the problem and the solution, kept as a
+#              small float array, so a submitted answer is graded by evaluating it at those points only,
+#              and a batch of submissions is compared with the fingerprint in one vectorized step
+
+import functools
+
+import mpgEvaluate
+from mpgNodes import Node
+from mpgEvaluate import compile_expression, load_numpy
+from mpgSolve import derivative, antiderivative
+
+POINTS = 16 # sample points a fingerprint keeps
+CANDIDATES = 4 # points drawn per point kept, at each scale
+SCALES = (3.0, 10.0, 100.0, 1.0, 0.25) # half-widths of the boxes points are drawn from, tried in order until enough are kept
+LIMIT = 1e8 # points where a value is larger than this are near a pole, and skipped
+RTOL, ATOL = 1e-6, 1e-9
+SEED = 0
+TASKS = ('value', 'derivative', 'antiderivative')
+CACHE_SIZE = 1 << 16 # fingerprints kept
+
+class DomainError(ValueError):
+    """No sample points could be found where a problem and its solution are both defined"""
+
+def _numpy():
+    if not load_numpy():
+        raise ImportError("grading needs NumPy")
+    return mpgEvaluate.np
+
+def _tree(expression):
+    return expression if isinstance(expression, Node) else expression.tree()
+
+def solution(expression, task='value', var=None):
+    """Returns the tree of the answer to a problem, or None when there's no closed form
+
+    @task: 'value' (the expression itself), 'derivative' or 'antiderivative', with respect to var
+           (by default the first indeterminant)"""
+    if task == 'value':
+        return _tree(expression)
+    elif task == 'derivative':
+        return derivative(expression, var)
+    elif task == 'antiderivative':
+        return antiderivative(expression, var)
+    raise ValueError(f"task must be one of: {', '.join(TASKS)}")
+
+class Fingerprint:
+    """The values of a problem's solution at its sample points
+
+    @indets: the indeterminants, in the order of the rows of points
+    @points: float array of the coordinates, one row per indeterminant and one column per point
+    @values: float array of the solution's value at each point
+    @paired: for antiderivatives, which are only defined up to a constant; points come in pairs that
+             differ only in the variable of integration, and answers are compared by the differences
+             across each pair"""
+
+    __slots__ = ('indets', 'points', 'values', 'paired')
+
+    def __init__(self, indets, points, values, paired=False):
+        self.indets, self.points, self.values, self.paired = indets, points, values, paired
+
+    def __repr__(self):
+        return f"Fingerprint(indets={self.indets!r}, points={len(self)}, paired={self.paired})"
+
+    def __len__(self):
+        return self.values.shape[-1]
+
+    @property
+    def nbytes(self):
+        return self.points.nbytes + self.values.nbytes
+
+    def evaluate(self, answer):
+        """Returns an answer's values at the sample points (nan where it's undefined, or if it has
+        indeterminants the problem doesn't)
+
+        @answer: a Polynomial, Algebraic or Closeform instance, or an mpgNodes tree"""
+        np = _numpy()
+        try:
+            funct = compile_expression(_tree(answer), self.indets, 'numpy')
+        except ValueError:
+            return np.full(len(self), np.nan)
+        return funct(*self.points)
+
+    def compare(self, values, rtol=RTOL, atol=ATOL):
+        """Returns a bool array of which rows of values (one per answer, one column per sample point)
+        match the fingerprint within the tolerance, at every point"""
+        np = _numpy()
+        expected, values = self.values, np.atleast_2d(values)
+        if self.paired:
+            expected, values = expected[1::2] - expected[::2], values[:, 1::2] - values[:, ::2]
+        with np.errstate(invalid='ignore'):
+            return (np.abs(values - expected) <= atol + rtol * np.abs(expected)).all(axis=1)
+
+    def check(self, answer, rtol=RTOL, atol=ATOL):
+        """Returns whether an answer matches the fingerprint"""
+        return bool(self.compare(self.evaluate(answer), rtol, atol)[0])
+
+    def grade(self, answers, rtol=RTOL, atol=ATOL):
+        """Returns a bool array of which answers match the fingerprint
+
+        Each distinct answer is evaluated once, however many submissions share it, and all of them
+        are compared in one step"""
+        np = _numpy()
+        rows, index = {}, []
+        for answer in answers:
+            node = _tree(answer)
+            index.append(rows.setdefault(node, len(rows)))
+        if not rows:
+            return np.zeros(0, dtype=bool)
+        values = np.empty((len(rows), len(self)))
+        for node, row in rows.items():
+            values[row] = self.evaluate(node)
+        return self.compare(values, rtol, atol)[np.asarray(index)]
+
+def _valid(values, np):
+    # a bool array of the points where every array of values is finite and away from poles
+    valid = True
+    for value in values:
+        valid = valid & np.isfinite(value) & (np.abs(value) < LIMIT)
+    return valid
+
+def _candidates(rng, count, scale, dims, var, np):
+    # points uniformly in [-scale, scale]**dims; when var is an index, they come in pairs that differ
+    # only in that coordinate
+    points = rng.uniform(-scale, scale, (dims, count))
+    if var is not None:
+        points = np.repeat(points, 2, axis=1)
+        points[var, 1::2] = rng.uniform(-scale, scale, count)
+    return points
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _fingerprint(problem, answer, indets, paired, points, seed):
+    np = _numpy()
+    rng = np.random.default_rng([seed, *map(ord, indets)]) # the same points for every problem of the same indeterminants
+    functs = [compile_expression(node, indets, 'numpy') for node in (problem, answer)]
+    var = 0 if paired else None # the variable of integration is the first indeterminant
+    group = 2 if paired else 1
+
+    kept = []
+    for scale in SCALES:
+        candidates = _candidates(rng, points * CANDIDATES, scale, len(indets), var, np)
+        valid = _valid([funct(*candidates) for funct in functs], np)
+        if paired: # both points of a pair
+            valid = np.repeat(valid[::2] & valid[1::2], 2)
+        kept.append(candidates[:, valid])
+        if sum(k.shape[1] for k in kept) >= points * group:
+            break
+    kept = np.concatenate(kept, axis=1)[:, :points * group]
+    if not kept.shape[1]: # cached too, so an empty domain is only searched once
+        return None
+
+    kept = np.ascontiguousarray(kept)
+    values = functs[1](*kept)
+    kept.flags.writeable = values.flags.writeable = False # shared by every caller
+    return Fingerprint(indets, kept, values, paired)
+
+def fingerprint(expression, task='value', var=None, points=POINTS, seed=SEED):
+    """Returns the fingerprint of a problem's solution; cached, so each problem is only sampled once
+
+    @expression: a Polynomial, Algebraic or Closeform instance, or an mpgNodes tree
+    @task: 'value', 'derivative' or 'antiderivative' (with respect to var)
+    @points: the number of sample points (pairs of them, for antiderivatives); fewer are kept
+             if the domain is too narrow to find that many
+
+    Sample points are drawn where the problem and its solution are both defined and finite (so
+    ln of negatives, even roots of negatives and poles are avoided); raises DomainError if there are none"""
+    problem = _tree(expression)
+    answer = solution(expression, task, var)
+    if answer is None:
+        raise ValueError(f"no closed-form {task} of {problem!r}")
+    indets = expression.indets if not isinstance(expression, Node) else mpgEvaluate.indeterminants(problem)
+    if var is not None: # the variable of integration goes first
+        indets = var + indets.replace(var, '')
+    elif not indets:
+        indets = 'x'
+    result = _fingerprint(problem, answer, indets, task == 'antiderivative', points, seed)
+    if result is None:
+        from mpgRender import render
+        raise DomainError(f"no sample points where {render(problem, 'plain')} and its {task} are both defined "
+                          f"(searched boxes of half-width {', '.join(map(str, SCALES))})")
+    return result
+
+def grade(expression, answers, task='value', var=None, rtol=RTOL, atol=ATOL):
+    """Returns a bool array of which answers to a problem are right
+
+    @answers: Polynomial, Algebraic or Closeform instances, or mpgNodes trees"""
+    return fingerprint(expression, task, var).grade(answers, rtol, atol)
+
+def check(expression, answer, task='value', var=None, rtol=RTOL, atol=ATOL):
+    """Returns whether an answer to a problem is right"""
+    return fingerprint(expression, task, var).check(answer, rtol, atol)
+
+def cache_info():
+    return _fingerprint.cache_info()
+
+def clear_cache():
+    _fingerprint.cache_clear()
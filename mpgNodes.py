@@ -0,0 +1,233 @@
+# description: this file contains the typed expression tree built by the classes in mpgExpressions;
+#              nodes are small, immutable and interned __slots__ objects, and tokens() converts a tree back into
+#              the nested list form the expression classes have always returned
+
+import functools, weakref
+
+class Node:
+    """Base of all expression nodes; subclasses list their attributes in _fields,
+    in constructor order
+
+    Nodes are interned (hash-consed): constructing a node equal to a live one returns the
+    existing object, so structurally equal trees are identical and compare in O(1). The
+    constructor arguments are kept as one tuple, shared with the intern table"""
+
+    __slots__ = ('_args', '_hash', '__weakref__')
+    _fields = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # every distinct node of the class is created once and shared while it's alive
+        cls._interned = weakref.WeakValueDictionary()
+        for index, field in enumerate(cls._fields):
+            setattr(cls, field, property(lambda self, index=index: self._args[index]))
+
+    def __new__(cls, *args):
+        if len(args) != len(cls._fields):
+            raise TypeError(f"{cls.__name__} takes {len(cls._fields)} arguments ({len(args)} given)")
+        node = cls._interned.get(args)
+        if node is None:
+            node = object.__new__(cls)
+            object.__setattr__(node, '_args', args)
+            object.__setattr__(node, '_hash', hash((cls.__name__, args))) # children already carry their hashes
+            node = cls._interned.setdefault(args, node)
+        return node
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} nodes are immutable")
+
+    def __reduce__(self): # re-interns on unpickling
+        return (type(self), self._args)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(map(repr, self._args))})"
+
+    def __eq__(self, other):
+        # interned nodes are equal only when identical; the rest guards nodes raced in from threads
+        if self is other:
+            return True
+        return (type(self) is type(other) and self._hash == other._hash
+                and self._args == other._args)
+
+    def __hash__(self):
+        return self._hash
+
+    def args(self):
+        """Returns the constructor arguments of the node"""
+        return self._args
+
+    def children(self):
+        """Returns the child nodes, in order"""
+        return ()
+
+    def walk(self):
+        """A generator; yields the node and every node beneath it, depth-first"""
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children()))
+
+class Const(Node):
+    """A whole number"""
+    __slots__ = ()
+    _fields = ('value',)
+
+class Rational(Node):
+    """A fraction numer/denom; the sign is carried by numer"""
+    __slots__ = ()
+    _fields = ('numer', 'denom')
+
+class Var(Node):
+    """An indeterminant, e.g. 'x'"""
+    __slots__ = ()
+    _fields = ('name',)
+
+class Pow(Node):
+    """base raised to a whole number exponent"""
+    __slots__ = ()
+    _fields = ('base', 'exp')
+
+    def children(self):
+        return (self.base,)
+
+class Mul(Node):
+    """A product of a tuple of factors; generated terms start with their coefficient"""
+    __slots__ = ()
+    _fields = ('factors',)
+
+    def children(self):
+        return self.factors
+
+class Add(Node):
+    """A sum of a tuple of terms"""
+    __slots__ = ()
+    _fields = ('terms',)
+
+    def children(self):
+        return self.terms
+
+class Div(Node):
+    """A quotient numer/denom of two expressions"""
+    __slots__ = ()
+    _fields = ('numer', 'denom')
+
+    def children(self):
+        return (self.numer, self.denom)
+
+class Func(Node):
+    """A named function of an argument, e.g. 'sin', 'arccosh', 'ln', 'log-2' or 'exp'"""
+    __slots__ = ()
+    _fields = ('name', 'arg')
+
+    def children(self):
+        return (self.arg,)
+
+class Root(Node):
+    """The nth-root of an argument"""
+    __slots__ = ()
+    _fields = ('n', 'arg')
+
+    def children(self):
+        return (self.arg,)
+
+COEFFICIENTS = (Const, Rational)
+
+def interned_count():
+    """Returns the number of distinct live nodes"""
+    return sum(len(cls._interned) for cls in Node.__subclasses__())
+
+def node_cache(function):
+    """Decorates a function of a single node so it's computed once per distinct node;
+    results are dropped with the node, and the cache is exposed as function.cache
+
+    A result that is the node itself (e.g. a tree already in canonical form) is only noted in a
+    weak set, function.fixed; as a cache value, it would keep its own key alive forever"""
+    cache = weakref.WeakKeyDictionary()
+    fixed = weakref.WeakSet()
+
+    @functools.wraps(function)
+    def wrapper(node):
+        try:
+            return cache[node]
+        except KeyError:
+            pass
+        if node in fixed:
+            return node
+        result = function(node)
+        if result is node:
+            fixed.add(node)
+        else:
+            cache[node] = result
+        return result
+
+    wrapper.cache = cache
+    wrapper.fixed = fixed
+    return wrapper
+
+def coefficient_node(coeff):
+    """Converts a coefficient list from Expression.get_coefficients, e.g. ['-', 3, '/', 4], into a node"""
+    value = -coeff[1] if coeff[0] == '-' else coeff[1]
+    if len(coeff) == 2:
+        return Const(value)
+    return Rational(value, coeff[3])
+
+def tokens(node):
+    """Converts a tree into the nested list form, e.g. a polynomial term becomes
+    (['+', 3], ['x', '**', 2]) and a trig term [['+', 1], 'sin', '**', 1, '(', 'x', ')']"""
+    kind = type(node)
+    if kind is Const:
+        return ['+' if node.value >= 0 else '-', abs(node.value)]
+    elif kind is Rational:
+        return ['+' if node.numer >= 0 else '-', abs(node.numer), '/', node.denom]
+    elif kind is Var:
+        return node.name
+    elif kind is Add:
+        return [tokens(term) for term in node.terms]
+    elif kind is Div:
+        return [tokens(node.numer), '/', tokens(node.denom)]
+    elif kind is Mul:
+        return _term_tokens(node)
+    elif kind is Pow:
+        return [_arg_tokens(node.base), '**', node.exp]
+    elif kind is Func:
+        return [node.name, '(', _arg_tokens(node.arg), ')']
+    elif kind is Root:
+        return [f"{node.n}-root", '(', _arg_tokens(node.arg), ')']
+    raise TypeError(f"not an expression node: {node!r}")
+
+def _arg_tokens(node):
+    # the inside of a function is a bare value or indeterminant, or a nested expression
+    if type(node) is Const:
+        return node.value
+    return tokens(node)
+
+def _term_tokens(node):
+    coeff, *factors = node.factors
+    if type(coeff) not in COEFFICIENTS: # a product of whole expressions
+        result = [tokens(coeff)]
+        for factor in factors:
+            result.extend(['*', tokens(factor)])
+        return result
+
+    # monomials pair the coefficient with the flattened indeterminants and degrees
+    if all(type(f) is Var or (type(f) is Pow and type(f.base) is Var) for f in factors):
+        form = []
+        for f in factors:
+            if type(f) is Var:
+                form.append(f.name)
+            else:
+                form.extend([f.base.name, '**', f.exp])
+        return (tokens(coeff), form)
+
+    result = [tokens(coeff)]
+    for f in factors:
+        if type(f) is Pow and type(f.base) is Func:
+            result.extend([f.base.name, '**', f.exp, '(', _arg_tokens(f.base.arg), ')'])
+        elif type(f) is Func and f.name == 'exp':
+            result.extend(['e**', _arg_tokens(f.arg)])
+        elif type(f) is Var:
+            result.append(f.name)
+        else:
+            result.extend(tokens(f))
+    return result
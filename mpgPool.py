@@ -0,0 +1,194 @@
+# description: a pool of pre-generated problems for latency-sensitive serving; each configuration
+#              (class, params, difficulty) has a warm queue that background threads top back up once it
+#              falls below a low-water mark, so a request is an O(1) pop rather than a call to new(), and
+#              configurations that haven't been asked for lately are evicted to keep under a memory budget
+
+import collections, itertools, random, sys, threading
+
+from main import EXPRESSIONS, generate_problem, problem_seed
+
+def sizeof(problem):
+    """Returns an estimate of the bytes a problem (nested lists, tuples, strings and numbers) takes"""
+    size = sys.getsizeof(problem)
+    if isinstance(problem, (list, tuple)):
+        size += sum(map(sizeof, problem))
+    return size
+
+def configuration(kind, difficulty=None, **params):
+    """Returns the key of a configuration, e.g. configuration('closeform', degree=5, indeterminants='wxyz')"""
+    if kind not in EXPRESSIONS:
+        raise ValueError(f"expression must be one of: {', '.join(sorted(EXPRESSIONS))}")
+    return (kind, difficulty, tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in params.items())))
+
+class _Queue:
+    """The warm problems of one configuration, and the expression that generates them"""
+
+    __slots__ = ('key', 'expression', 'seed', 'randomize', 'problems', 'bytes', 'indexes', 'lock', 'refilling', 'evicted')
+
+    def __init__(self, key, seed, indexes):
+        kind, difficulty, params = key
+        self.key = key
+        self.expression = EXPRESSIONS[kind](lazy=True, **dict(params)) # lazy, so nothing's generated until asked for
+        self.expression.rng = random.Random()
+        # with a seed, problem i of each configuration is the same every time, from (seed, key, i)
+        self.seed = None if seed is None else problem_seed(seed, repr(key))
+        self.randomize = not params # a configuration without params is random(), like the CLI's default
+        self.problems = collections.deque() # (problem, size)
+        self.bytes = 0
+        self.indexes = indexes # of the problems generated; carried on by the queue that replaces an evicted one
+        self.lock = threading.Lock() # one generator at a time; expressions aren't thread-safe
+        self.refilling = False
+        self.evicted = False
+
+    def generate(self):
+        with self.lock:
+            return generate_problem(self.expression, next(self.indexes), self.seed, self.randomize, self.key[1])
+
+class ProblemPool:
+    """Keeps warm queues of pre-generated problems, per configuration
+
+    @target: problems a queue is filled up to
+    @low_water: a queue with fewer problems than this is queued for refilling
+    @memory_budget: bytes the queued problems may take, in all; past it, the least recently used
+                    configurations are evicted
+    @threads: background refill threads
+    @seed: master seed; makes the problems of each configuration the same sequence every run
+
+    A configuration's first request is generated on the spot (and starts its queue filling);
+    after that, requests are served from the queue. Refill threads share the GIL with the caller,
+    so they generate a problem at a time, between which requests are served"""
+
+    def __init__(self, target=64, low_water=16, memory_budget=64 << 20, threads=2, seed=None):
+        self.target = target
+        self.low_water = low_water
+        self.memory_budget = memory_budget
+        self.seed = seed
+        self.bytes = 0
+        self.hits = self.misses = self.evictions = 0
+        self._queues = collections.OrderedDict() # key -> _Queue, least recently used first
+        self._indexes = {} # key -> the problem index counter of a seeded configuration, kept through evictions
+        self._lock = threading.Lock()
+        self._refills = collections.deque()
+        self._wakeup = threading.Condition(self._lock)
+        self._closed = False
+        self._threads = [threading.Thread(target=self._refill, name=f"ProblemPool-{i}", daemon=True)
+                         for i in range(threads)]
+        for thread in self._threads:
+            thread.start()
+
+    def __repr__(self):
+        return f"ProblemPool(configurations={len(self._queues)}, bytes={self.bytes}, hits={self.hits}, misses={self.misses})"
+
+    def __len__(self):
+        """Returns the number of problems in the pool"""
+        with self._lock:
+            return sum(len(queue.problems) for queue in self._queues.values())
+
+    def _queue(self, key):
+        # returns the configuration's queue (making it if it's new) and whether it was already there;
+        # a queue made again after eviction carries on from the problems its predecessor made, so a
+        # seeded configuration doesn't repeat them
+        with self._lock:
+            queue = self._queues.get(key)
+            if queue is not None:
+                self._queues.move_to_end(key)
+                return queue, True
+            indexes = itertools.count() if self.seed is None else self._indexes.setdefault(key, itertools.count())
+            queue = self._queues[key] = _Queue(key, self.seed, indexes)
+            return queue, False
+
+    def get(self, kind, difficulty=None, **params):
+        """Returns a problem of a configuration; from its queue if it's warm, else made on the spot"""
+        return self.get_key(configuration(kind, difficulty, **params))
+
+    def get_key(self, key):
+        queue, _ = self._queue(key)
+        with self._lock:
+            if queue.problems:
+                problem, size = queue.problems.popleft()
+                queue.bytes -= size
+                self.bytes -= size
+                self.hits += 1
+            else:
+                problem = None
+                self.misses += 1
+            self._request_refill(queue)
+        return problem if problem is not None else queue.generate()
+
+    def prime(self, kind, difficulty=None, **params):
+        """Starts filling the queue of a configuration, ahead of its requests"""
+        queue, _ = self._queue(configuration(kind, difficulty, **params))
+        with self._lock:
+            self._request_refill(queue)
+
+    def _request_refill(self, queue):
+        # with the lock held
+        if len(queue.problems) < self.low_water and not queue.refilling and not queue.evicted:
+            queue.refilling = True
+            self._refills.append(queue)
+            self._wakeup.notify()
+
+    def _refill(self):
+        # a background thread; fills queued configurations up to the target, a problem at a time
+        while True:
+            with self._lock:
+                while not self._refills and not self._closed:
+                    self._wakeup.wait()
+                if self._closed:
+                    return
+                queue = self._refills.popleft()
+
+            while True:
+                with self._lock:
+                    # past the budget, older configurations make room; with nothing left to evict
+                    # (or this one evicted), the queue stays short
+                    self._evict()
+                    if (queue.evicted or self._closed or len(queue.problems) >= self.target
+                            or self.bytes > self.memory_budget):
+                        queue.refilling = False
+                        break
+                problem = queue.generate()
+                size = sizeof(problem)
+                with self._lock:
+                    if queue.evicted:
+                        continue
+                    queue.problems.append((problem, size))
+                    queue.bytes += size
+                    self.bytes += size
+                    self._evict()
+
+    def _evict(self):
+        # with the lock held; drops least recently used configurations until under budget,
+        # always keeping the most recent
+        while self.bytes > self.memory_budget and len(self._queues) > 1:
+            _, queue = self._queues.popitem(last=False)
+            queue.evicted = True
+            self.bytes -= queue.bytes
+            self.evictions += 1
+
+    def stats(self):
+        """Returns a dict of the pool's counters"""
+        with self._lock:
+            return {
+                'configurations': len(self._queues),
+                'problems': sum(len(queue.problems) for queue in self._queues.values()),
+                'bytes': self.bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'refilling': sum(queue.refilling for queue in self._queues.values()),
+            }
+
+    def close(self):
+        """Stops the refill threads"""
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,332 @@
+# description: renders generated expressions as LaTeX, plain text or MathML. Each renderer walks a
+#              tree once, building strings from its children's cached renderings, so repeated
+#              subterms (coefficients, x**n terms, sin(x) wrappers) are only rendered once
+
+import weakref
+from html import escape
+
+from mpgNodes import Node, Const, Rational, Var, Pow, Mul, Add, Div, Func, Root
+
+# precedence of a rendering, for deciding when it needs parentheses inside another
+SUM, PRODUCT, POWER, ATOM = 1, 2, 3, 4
+
+class Renderer:
+    """Base of the renderers; subclasses say how each piece of notation is written
+
+    Renderings are memoized per node as (negative, body, precedence), where a leading minus sign
+    is kept apart from the body so sums can write it as an operator"""
+
+    def __init__(self):
+        self._cache = weakref.WeakKeyDictionary()
+
+    def __call__(self, node):
+        negative, body, _ = self.render(node)
+        return self.document(self.negate(body) if negative else body)
+
+    def render(self, node):
+        try:
+            return self._cache[node]
+        except KeyError:
+            result = self._cache[node] = self._render(node)
+            return result
+
+    def operand(self, node, precedence):
+        """Returns the rendering of a node inside an operator of the given precedence"""
+        negative, body, prec = self.render(node)
+        if negative:
+            return self.paren(self.negate(body))
+        return self.paren(body) if prec < precedence else body
+
+    def _render(self, node):
+        kind = type(node)
+        if kind is Const:
+            return (node.value < 0, self.number(abs(node.value)), ATOM)
+        elif kind is Rational:
+            return (node.numer < 0, self.fraction(self.number(abs(node.numer)), self.number(node.denom)), self.FRACTION)
+        elif kind is Var:
+            return (False, self.var(node.name), ATOM)
+        elif kind is Pow:
+            if node.exp == 1:
+                return self.render(node.base)
+            if type(node.base) is Func and node.base.name != 'exp': # e.g. sin^2(x), where the notation has it
+                body = self.function_power(node.base.name, self.number(node.exp), self.function_arg(node.base.arg))
+                if body is not None:
+                    return (False, body, ATOM)
+            return (False, self.power(self.operand(node.base, ATOM), self.number(node.exp)), POWER)
+        elif kind is Mul:
+            return self._product(node.factors)
+        elif kind is Add:
+            return self._sum(node.terms)
+        elif kind is Div:
+            return (False, self.quotient(self.operand(node.numer, self.FRACTION + 1), self.operand(node.denom, self.FRACTION + 1)), self.FRACTION)
+        elif kind is Root:
+            return (False, self.root(node.n, self.render_plain(node.arg)), ATOM)
+        elif kind is Func:
+            if node.name == 'exp':
+                return (False, self.power(self.var('e'), self.exponent(node.arg)), POWER)
+            return (False, self.function(node.name, self.function_arg(node.arg)), ATOM)
+        raise TypeError(f"not an expression node: {node!r}")
+
+    def render_plain(self, node):
+        # the rendering of a node on its own, with its sign
+        negative, body, _ = self.render(node)
+        return self.negate(body) if negative else body
+
+    def function_arg(self, node):
+        return self.paren(self.render_plain(node))
+
+    def exponent(self, node):
+        return self.operand(node, ATOM)
+
+    def _product(self, factors):
+        if not factors:
+            return (False, self.number(1), ATOM)
+        negative, parts, nodes = False, [], []
+        rest = factors
+        if type(factors[0]) in (Const, Rational): # the coefficient carries the sign of the product
+            coeff, rest = factors[0], factors[1:]
+            if not rest:
+                return self.render(coeff)
+            negative, body, _ = self.render(coeff)
+            if body != self.number(1):
+                parts.append(body)
+                nodes.append(coeff)
+        for f in rest:
+            parts.append(self.operand(f, PRODUCT + 1))
+            nodes.append(f)
+        if len(parts) == 1:
+            prec = self.render(nodes[0])[2]
+            return (negative, parts[0], ATOM if parts[0] != self.render(nodes[0])[1] else prec)
+        return (negative, self.product(parts, nodes), PRODUCT)
+
+    def _sum(self, terms):
+        if not terms:
+            return (False, self.number(0), ATOM)
+        if len(terms) == 1:
+            return self.render(terms[0])
+        negative, body, _ = self.render(terms[0])
+        parts = [body]
+        for term in terms[1:]:
+            neg, body, prec = self.render(term)
+            if neg and prec <= SUM: # a nested sum led by a negative term; the sign is that term's alone
+                parts.append(self.plus())
+                parts.append(self.paren(self.negate(body)))
+                continue
+            parts.append(self.minus() if neg else self.plus())
+            parts.append(body)
+        return (negative, self.sum(parts), SUM)
+
+    # notation; overridden by each format
+
+    FRACTION = PRODUCT # precedence of fractions and quotients
+
+    def document(self, body):
+        return body
+
+    def paren(self, body):
+        return f"({body})"
+
+class PlainRenderer(Renderer):
+    """Renders plain text, e.g. 3/4*x^2*y - sin(x)"""
+
+    def number(self, value):
+        return str(value)
+
+    def fraction(self, numer, denom):
+        return f"{numer}/{denom}"
+
+    def var(self, name):
+        return name
+
+    def negate(self, body):
+        return f"-{body}"
+
+    def power(self, base, exp):
+        return f"{base}^{exp}"
+
+    def function_power(self, name, exp, arg):
+        return None
+
+    def product(self, parts, nodes):
+        return '*'.join(parts)
+
+    def sum(self, parts):
+        return parts[0] + ''.join(parts[1:])
+
+    def plus(self):
+        return ' + '
+
+    def minus(self):
+        return ' - '
+
+    def quotient(self, numer, denom):
+        return f"{numer}/{denom}"
+
+    def root(self, n, arg):
+        if n == 2:
+            return f"sqrt({arg})"
+        return f"root{n}({arg})"
+
+    def function(self, name, arg):
+        if name.startswith('log-'):
+            return f"log_{name[4:]}{arg}"
+        return f"{name}{arg}"
+
+class LatexRenderer(Renderer):
+    """Renders LaTeX math, e.g. \\frac{3}{4}x^{2}y - \\sin(x)"""
+
+    FRACTION = ATOM
+    # functions with their own LaTeX command; the rest are written with \operatorname
+    COMMANDS = {'sin', 'cos', 'tan', 'csc', 'sec', 'cot', 'arcsin', 'arccos', 'arctan',
+                'sinh', 'cosh', 'tanh', 'coth', 'ln'}
+
+    def number(self, value):
+        return str(value)
+
+    def fraction(self, numer, denom):
+        return f"\\frac{{{numer}}}{{{denom}}}"
+
+    def var(self, name):
+        return name
+
+    def negate(self, body):
+        return f"-{body}"
+
+    def paren(self, body):
+        return f"\\left({body}\\right)"
+
+    def power(self, base, exp):
+        return f"{base}^{{{exp}}}"
+
+    def _name(self, name):
+        if name in self.COMMANDS:
+            return f"\\{name}"
+        return f"\\operatorname{{{name}}}"
+
+    def function_power(self, name, exp, arg):
+        if name.startswith('log-'):
+            return None
+        return f"{self._name(name)}^{{{exp}}}{arg}"
+
+    def product(self, parts, nodes):
+        # numbers and fractions after the first factor are set apart with a dot
+        result = [parts[0]]
+        for part, node in zip(parts[1:], nodes[1:]):
+            result.append(f" \\cdot {part}" if type(node) in (Const, Rational, Div) else part)
+        return ''.join(result)
+
+    def sum(self, parts):
+        return ''.join(parts)
+
+    def plus(self):
+        return ' + '
+
+    def minus(self):
+        return ' - '
+
+    def quotient(self, numer, denom):
+        return f"\\frac{{{numer}}}{{{denom}}}"
+
+    def operand(self, node, precedence):
+        if precedence > ATOM: # fractions need no parentheses around their parts
+            return self.render_plain(node)
+        return super().operand(node, precedence)
+
+    def root(self, n, arg):
+        if n == 2:
+            return f"\\sqrt{{{arg}}}"
+        return f"\\sqrt[{n}]{{{arg}}}"
+
+    def exponent(self, node):
+        return self.render_plain(node)
+
+    def function(self, name, arg):
+        if name.startswith('log-'):
+            return f"\\log_{{{name[4:]}}}{arg}"
+        return f"{self._name(name)}{arg}"
+
+class MathMLRenderer(Renderer):
+    """Renders presentation MathML, e.g. <math><mrow><msup><mi>x</mi><mn>2</mn></msup>...</mrow></math>"""
+
+    FRACTION = ATOM
+
+    def document(self, body):
+        return f'<math xmlns="http://www.w3.org/1998/Math/MathML">{body}</math>'
+
+    def number(self, value):
+        return f"<mn>{value}</mn>"
+
+    def fraction(self, numer, denom):
+        return f"<mfrac>{numer}{denom}</mfrac>"
+
+    def var(self, name):
+        return f"<mi>{escape(name)}</mi>"
+
+    def negate(self, body):
+        return f"<mrow><mo>-</mo>{body}</mrow>"
+
+    def paren(self, body):
+        return f"<mrow><mo>(</mo>{body}<mo>)</mo></mrow>"
+
+    def power(self, base, exp):
+        return f"<msup>{base}{exp}</msup>"
+
+    def function_power(self, name, exp, arg):
+        if name.startswith('log-'):
+            return None
+        return f"<mrow><msup><mi>{name}</mi>{exp}</msup><mo>&#x2061;</mo>{arg}</mrow>"
+
+    def product(self, parts, nodes):
+        return '<mrow>' + '<mo>&#x2062;</mo>'.join(parts) + '</mrow>'
+
+    def sum(self, parts):
+        return '<mrow>' + ''.join(parts) + '</mrow>'
+
+    def plus(self):
+        return '<mo>+</mo>'
+
+    def minus(self):
+        return '<mo>-</mo>'
+
+    def quotient(self, numer, denom):
+        return f"<mfrac>{numer}{denom}</mfrac>"
+
+    def operand(self, node, precedence):
+        if precedence > ATOM:
+            return self.render_plain(node)
+        return super().operand(node, precedence)
+
+    def root(self, n, arg):
+        if n == 2:
+            return f"<msqrt>{arg}</msqrt>"
+        return f"<mroot><mrow>{arg}</mrow><mn>{n}</mn></mroot>"
+
+    def exponent(self, node):
+        return self.render_plain(node)
+
+    def function(self, name, arg):
+        if name.startswith('log-'):
+            name = f"<msub><mi>log</mi><mn>{escape(name[4:])}</mn></msub>"
+        else:
+            name = f"<mi>{name}</mi>"
+        return f"<mrow>{name}<mo>&#x2061;</mo>{arg}</mrow>"
+
+RENDERERS = {
+    'latex': LatexRenderer(),
+    'plain': PlainRenderer(),
+    'mathml': MathMLRenderer(),
+}
+
+def render(expression, fmt='latex'):
+    """Renders an expression as 'latex', 'plain' text or 'mathml'
+
+    @expression: a Polynomial, Algebraic or Closeform instance, or an mpgNodes tree"""
+    node = expression if isinstance(expression, Node) else expression.tree()
+    return RENDERERS[fmt](node)
+
+def render_many(expressions, fmt='latex'):
+    """A generator; renders each expression of an iterable (e.g. a stream of trees) in turn,
+    sharing the rendering cache between them"""
+    renderer = RENDERERS[fmt]
+    for expression in expressions:
+        yield renderer(expression if isinstance(expression, Node) else expression.tree())
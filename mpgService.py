@@ -0,0 +1,358 @@
+# description: an asyncio HTTP/JSON service for generating problems, with the standard library only;
+#              requests are split into chunks, chunks from concurrent requests are micro-batched into
+#              shared calls to a pool of worker processes, and results are streamed back as JSON Lines
+#              as they're made. Every problem is seeded from (request seed, problem index), so a response
+#              is reproducible whatever it was batched with
+#              run: python mpgService.py [--host HOST] [--port PORT] [--processes N]
+#
+#              POST /problems {"expression": "closeform", "count": 100, "seed": 7, "difficulty": 4,
+#                              "randomize": true, "params": {"degree": 2, "indeterminants": "xy"},
+#                              "format": "tokens" | "latex" | "plain" | "mathml"}
+#              GET /problems?expression=closeform&count=100&seed=7&degree=2 (the same, params inline)
+#              GET /health
+
+import argparse, asyncio, collections, concurrent.futures, copy, functools, inspect, json, multiprocessing, random, urllib.parse
+
+from main import EXPRESSIONS, generate_tree
+
+FORMATS = ('tokens', 'latex', 'plain', 'mathml')
+REQUEST_FIELDS = {'expression', 'count', 'seed', 'randomize', 'difficulty', 'format', 'params'}
+MAX_HEADER = 16 * 1024
+MAX_BODY = 64 * 1024
+MAX_DEGREE = 10
+MAX_INDETERMINANTS = 8
+MAX_BOUND = 10**6 # of lowbound and highbound, either way
+MAX_ROOT = 10
+
+class RequestError(Exception):
+    """A bad request; the message is sent back with the status"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+@functools.lru_cache(maxsize=128)
+def _configured(kind, params):
+    # a configured instance per (kind, params), which the batches a worker runs copy
+    return EXPRESSIONS[kind](**dict(params))
+
+def _expression(kind, params):
+    # a copy per job, since generating changes an instance (its rng, and the attributes random() draws);
+    # so jobs don't see each other's, in a process or in a thread pool
+    return copy.copy(_configured(kind, params))
+
+def generate_batch(jobs):
+    """Runs in a worker; generates each job of a batch, returning a list of problem lists
+
+    A job is (kind, params, seed, start, stop, randomize, difficulty, fmt), params being a tuple of
+    (name, value) pairs; problem i of a job is problem i of the seed, as in main.problem_generator"""
+    results = []
+    for kind, params, seed, start, stop, randomize, difficulty, fmt in jobs:
+        expression = _expression(kind, params)
+        problems = []
+        for index in range(start, stop):
+            tree = generate_tree(expression, index, seed, randomize, difficulty)
+            if fmt == 'tokens':
+                problems.append(expression())
+            else:
+                from mpgRender import render
+                problems.append(render(tree, fmt))
+        results.append(problems)
+    return results
+
+def _integer(value, low, high):
+    return type(value) is int and low <= value <= high
+
+def _check_params(params):
+    # the values of the params a class takes; raises RequestError for one out of range
+    for name, value in params.items():
+        if name == 'degree' and not _integer(value, 0, MAX_DEGREE):
+            raise RequestError(f"degree must be 0 to {MAX_DEGREE}")
+        elif name == 'indeterminants' and not (isinstance(value, str) and value.isascii() and value.isalpha()
+                                               and 1 <= len(value) <= MAX_INDETERMINANTS):
+            raise RequestError(f"indeterminants must be 1 to {MAX_INDETERMINANTS} letters")
+        elif name in ('lowbound', 'highbound') and not _integer(value, -MAX_BOUND, MAX_BOUND):
+            raise RequestError(f"{name} must be an integer from {-MAX_BOUND} to {MAX_BOUND}")
+        elif name == 'root' and not _integer(value, 1, MAX_ROOT):
+            raise RequestError(f"root must be 1 to {MAX_ROOT}")
+        elif name == 'algebraic' and value is not False and not (
+                isinstance(value, list) and len(value) == 3 and _integer(value[0], 1, MAX_ROOT)
+                and type(value[1]) is bool and type(value[2]) is bool):
+            raise RequestError(f"algebraic must be false or [root (1 to {MAX_ROOT}), rational, proper]")
+        elif name in ('rational', 'proper', 'trig', 'log', 'expo', 'simplify') and type(value) is not bool:
+            raise RequestError(f"{name} must be true or false")
+    lowbound, highbound = params.get('lowbound', -10), params.get('highbound', 10)
+    if lowbound >= highbound:
+        raise RequestError("lowbound must be less than highbound")
+    if (lowbound, highbound) == (0, 1): # no non-zero denominator to draw
+        raise RequestError("the coefficient range must hold a value other than 0")
+
+class ProblemService:
+    """Generates problems for concurrent requests, sharing a pool of worker processes
+
+    @processes: worker processes (default: one per core); or pass an executor
+    @batch_size: the most chunks sent to a worker in one call
+    @batch_delay: seconds a chunk waits for others to batch with, at most
+    @chunk_size: problems per chunk; a response streams a chunk at a time
+    @max_inflight: the most chunks queued or generating at once; further chunks wait their turn
+    @max_requests: the most requests served at once; more are refused with 503
+    @max_problems: the most problems one request may ask for"""
+
+    def __init__(self, processes=None, executor=None, batch_size=32, batch_delay=0.002, chunk_size=64,
+                 max_inflight=256, max_requests=1024, max_problems=100000):
+        # workers are spawned, not forked, so they don't inherit (and hold open) client connections
+        self.executor = executor or concurrent.futures.ProcessPoolExecutor(processes, multiprocessing.get_context('spawn'))
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.chunk_size = chunk_size
+        self.max_requests = max_requests
+        self.max_problems = max_problems
+        self.active = 0 # requests being served
+        self._slots = asyncio.Semaphore(max_inflight)
+        self._pending = [] # (job, future) waiting to be batched
+        self._flush_handle = None
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def generate(self, job):
+        """Generates one chunk job, batched with whatever else is pending; returns its problems"""
+        async with self._slots:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending.append((job, future))
+            if len(self._pending) >= self.batch_size:
+                self._flush()
+            elif self._flush_handle is None:
+                self._flush_handle = loop.call_later(self.batch_delay, self._flush)
+            return await future
+
+    def _flush(self):
+        # sends the pending chunks to a worker as one batch
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        jobs = [job for job, _ in batch]
+        futures = [future for _, future in batch]
+        task = asyncio.get_running_loop().run_in_executor(self.executor, generate_batch, jobs)
+        task.add_done_callback(functools.partial(self._distribute, futures))
+
+    @staticmethod
+    def _distribute(futures, task):
+        if task.cancelled():
+            for future in futures:
+                future.cancel()
+            return
+        error = task.exception()
+        results = [None] * len(futures) if error else task.result()
+        for future, result in zip(futures, results):
+            if future.done(): # the request went away
+                continue
+            if error:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def parse(self, request):
+        """Validates a request dict; returns (kind, params, count, seed, randomize, difficulty, fmt)"""
+        unknown = set(request) - REQUEST_FIELDS
+        if unknown:
+            raise RequestError(f"unknown fields: {', '.join(sorted(unknown))}")
+        kind = request.get('expression')
+        if kind not in EXPRESSIONS:
+            raise RequestError(f"expression must be one of: {', '.join(sorted(EXPRESSIONS))}")
+        count = request.get('count', 1)
+        if type(count) is not int or count < 1:
+            raise RequestError("count must be a positive integer")
+        if count > self.max_problems:
+            raise RequestError(f"count is over the limit of {self.max_problems}", 413)
+        seed = request.get('seed')
+        if seed is None: # a seed is made up, and returned, so the response can be reproduced
+            seed = random.getrandbits(63)
+        elif type(seed) is not int:
+            raise RequestError("seed must be an integer")
+        difficulty = request.get('difficulty')
+        if difficulty is not None and (type(difficulty) is not int or difficulty not in range(1, 11)):
+            raise RequestError("difficulty must be 1 to 10")
+        fmt = request.get('format', 'tokens')
+        if fmt not in FORMATS:
+            raise RequestError(f"format must be one of: {', '.join(FORMATS)}")
+        params = request.get('params', {})
+        if not isinstance(params, dict):
+            raise RequestError("params must be an object")
+        accepted = set(inspect.signature(EXPRESSIONS[kind]).parameters) - {'rng', 'lazy'}
+        if set(params) - accepted:
+            raise RequestError(f"{kind} takes params: {', '.join(sorted(accepted))}")
+        _check_params(params)
+        params = tuple(sorted((name, tuple(v) if isinstance(v, list) else v) for name, v in params.items()))
+        randomize = bool(request.get('randomize', not params))
+        return kind, params, count, seed, randomize, difficulty, fmt
+
+    async def stream(self, kind, params, count, seed, randomize, difficulty, fmt, window=2):
+        """An async generator; yields the problems of a request a chunk at a time, in order,
+        with up to window chunks generating ahead of the one being sent"""
+        pending = collections.deque()
+        try:
+            for start in range(0, count, self.chunk_size):
+                job = (kind, params, seed, start, min(start + self.chunk_size, count), randomize, difficulty, fmt)
+                pending.append(asyncio.ensure_future(self.generate(job)))
+                if len(pending) >= window:
+                    yield await pending.popleft()
+            while pending:
+                yield await pending.popleft()
+        finally:
+            for task in pending: # the client went away; drop the chunks it won't read
+                task.cancel()
+
+    async def handle(self, reader, writer):
+        """Serves one HTTP request on a connection"""
+        try:
+            method, path, query, body = await _read_request(reader)
+            if path == '/health':
+                await _respond(writer, 200, {'status': 'ok', 'active': self.active})
+            elif path != '/problems':
+                await _respond(writer, 404, {'error': 'not found'})
+            elif method not in ('GET', 'POST'):
+                await _respond(writer, 405, {'error': 'method not allowed'})
+            elif self.active >= self.max_requests:
+                await _respond(writer, 503, {'error': 'busy'}, {'Retry-After': '1'})
+            else:
+                request = _query_request(query) if method == 'GET' else _json_request(body)
+                self.active += 1
+                try:
+                    await self._serve(writer, self.parse(request))
+                finally:
+                    self.active -= 1
+        except RequestError as error:
+            await _respond(writer, error.status, {'error': str(error)})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as error: # a bug; the client is still answered, the server keeps serving
+            await _respond(writer, 500, {'error': f"internal error: {type(error).__name__}"})
+        finally:
+            writer.close()
+
+    async def _serve(self, writer, request):
+        kind, params, count, seed, randomize, difficulty, fmt = request
+        chunks = self.stream(kind, params, count, seed, randomize, difficulty, fmt)
+        try:
+            try: # the first chunk is awaited before answering, so a failure can still be reported
+                chunk = await chunks.__anext__()
+            except (TypeError, ValueError) as error: # raised constructing or generating from the params
+                raise RequestError(f"can't generate: {error}") from None
+            except Exception as error:
+                raise RequestError(f"can't generate: {type(error).__name__}: {error}", 500) from None
+
+            writer.write(_head(200, {'Content-Type': 'application/x-ndjson', 'Transfer-Encoding': 'chunked',
+                                     'X-Seed': str(seed)}))
+            while True:
+                data = ''.join(json.dumps(problem) + '\n' for problem in chunk).encode()
+                writer.write(b'%x\r\n%s\r\n' % (len(data), data))
+                await writer.drain() # a slow client holds back its own chunks, not everyone's
+                try:
+                    chunk = await chunks.__anext__()
+                except StopAsyncIteration:
+                    break
+                except Exception: # past the head, a failure can only end the response short, without its last chunk
+                    return
+            writer.write(b'0\r\n\r\n')
+            await writer.drain()
+        finally:
+            await chunks.aclose()
+
+STATUS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+          413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+def _head(status, headers):
+    lines = [f"HTTP/1.1 {status} {STATUS[status]}", 'Connection: close']
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode()
+
+async def _respond(writer, status, payload, headers=None):
+    body = json.dumps(payload).encode()
+    writer.write(_head(status, {'Content-Type': 'application/json', 'Content-Length': len(body), **(headers or {})}))
+    writer.write(body)
+    await writer.drain()
+
+async def _read_request(reader):
+    # returns (method, path, query, body) of an HTTP/1.1 request
+    try:
+        head = await reader.readuntil(b'\r\n\r\n')
+    except asyncio.LimitOverrunError:
+        raise RequestError("request head too large", 413) from None
+    lines = head.decode('latin-1').split('\r\n')
+    try:
+        method, target, _ = lines[0].split(' ', 2)
+    except ValueError:
+        raise RequestError("malformed request line") from None
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    length = headers.get('content-length', '0') or '0'
+    if not (length.isascii() and length.isdigit()): # no sign, spaces, underscores or other digits int() would take
+        raise RequestError("bad Content-Length")
+    length = int(length)
+    if length > MAX_BODY:
+        raise RequestError("request body too large", 413)
+    body = await reader.readexactly(length) if length else b''
+    url = urllib.parse.urlsplit(target)
+    return method, url.path, url.query, body
+
+def _json_request(body):
+    try:
+        request = json.loads(body or b'{}')
+    except ValueError:
+        raise RequestError("body must be JSON") from None
+    if not isinstance(request, dict):
+        raise RequestError("body must be a JSON object")
+    return request
+
+def _query_value(text):
+    # query values are read as JSON where they can be (numbers, true/false), else as strings
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+def _query_request(query):
+    request, params = {}, {}
+    for name, value in urllib.parse.parse_qsl(query, keep_blank_values=True): # so an empty value is refused, not dropped
+        value = value if name in ('expression', 'format') else _query_value(value)
+        (request if name in REQUEST_FIELDS else params)[name] = value
+    if params:
+        request['params'] = params
+    return request
+
+async def serve(host='127.0.0.1', port=8000, **options):
+    """Runs the service until cancelled; options are passed to ProblemService"""
+    service = ProblemService(**options)
+    server = await asyncio.start_server(service.handle, host, port, limit=MAX_HEADER)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serves generated math problems over HTTP")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('-p', '--processes', type=int, help="worker processes (default: one per core)")
+    parser.add_argument('--chunk-size', type=int, default=64, help="problems per streamed chunk")
+    parser.add_argument('--batch-size', type=int, default=32, help="the most chunks per worker call")
+    args = parser.parse_args(argv)
+
+    print(f"serving on http://{args.host}:{args.port}")
+    try:
+        asyncio.run(serve(args.host, args.port, processes=args.processes, chunk_size=args.chunk_size,
+                          batch_size=args.batch_size))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
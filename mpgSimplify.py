@@ -0,0 +1,115 @@
+# description: simplification of generated expressions; one bottom-up pass drops zero terms and
+#              factors of 1, folds x**0 and **1, merges like terms and powers of the same indeterminant,
+#              and reduces fractions, so problems are smaller to store, render and evaluate.
+#              Memoized per node, so subterms shared between problems are only simplified once.
+#              The nested list form of a simplified tree is that of the tree as it is, not the generated shape
+
+from fractions import Fraction
+
+from mpgNodes import Node, Const, Rational, Var, Pow, Mul, Add, Div, Func, Root, node_cache
+from mpgSolve import number, value
+
+ZERO, ONE = Const(0), Const(1)
+
+def _factors(node):
+    # the coefficient (a Fraction, or None if there's no number in it) and other factors of a simplified term
+    if type(node) is Mul:
+        coeff = value(node.factors[0])
+        return coeff, node.factors[1:] if coeff is not None else node.factors
+    coeff = value(node)
+    return (coeff, ()) if coeff is not None else (None, (node,))
+
+def _product(factors):
+    # folds the numbers of a product, merges powers of the same indeterminant (in alphabetical order,
+    # ahead of the other factors) and drops factors of 1; a product keeps its coefficient first, as
+    # generated terms do, but only if it had one
+    coeff, powers, rest = None, {}, []
+    for factor in factors:
+        for f in factor.factors if type(factor) is Mul else (factor,):
+            v = value(f)
+            if v is not None:
+                coeff = v if coeff is None else coeff * v
+            elif type(f) is Var:
+                powers[f.name] = powers.get(f.name, 0) + 1
+            elif type(f) is Pow and type(f.base) is Var:
+                powers[f.base.name] = powers.get(f.base.name, 0) + f.exp
+            else:
+                rest.append(f)
+    if coeff == 0:
+        return ZERO
+    rest[:0] = [Var(name) if exp == 1 else Pow(Var(name), exp) for name, exp in sorted(powers.items()) if exp]
+    if coeff is None:
+        if not rest:
+            return ONE
+        return rest[0] if len(rest) == 1 else Mul(tuple(rest))
+    if not rest:
+        return number(coeff)
+    return Mul((number(coeff), *rest))
+
+def _sum(terms):
+    # flattens a sum, merges like terms (in the order they first appear, with the constant last) and
+    # drops terms that come to 0
+    constant, like = Fraction(0), {} # factors -> [coefficient, whether any of the terms had one]
+    for term in terms:
+        for t in term.terms if type(term) is Add else (term,):
+            coeff, factors = _factors(t)
+            if not factors:
+                constant += coeff
+                continue
+            merged = like.setdefault(factors, [0, False])
+            merged[0] += 1 if coeff is None else coeff
+            merged[1] = merged[1] or coeff is not None
+
+    result = []
+    for factors, (coeff, had_coeff) in like.items():
+        if coeff == 1 and not had_coeff: # e.g. a whole expression, added in as it is
+            result.append(factors[0] if len(factors) == 1 else Mul(factors))
+        elif coeff:
+            result.append(Mul((number(coeff), *factors)))
+    if constant:
+        result.append(number(constant))
+    if not result:
+        return ZERO
+    return result[0] if len(result) == 1 else Add(tuple(result))
+
+@node_cache
+def simplify(node):
+    """Returns the simplified tree of a tree; the value is the same wherever the original is defined"""
+    kind = type(node)
+    if kind is Const or kind is Var:
+        return node
+    elif kind is Rational: # reduced, with the sign on the numerator
+        return number(Fraction(node.numer, node.denom))
+    elif kind is Pow:
+        base = simplify(node.base)
+        if node.exp == 0:
+            return ONE
+        if node.exp == 1:
+            return base
+        v = value(base)
+        if v is not None:
+            return number(v ** node.exp)
+        return Pow(base, node.exp)
+    elif kind is Mul:
+        return _product(map(simplify, node.factors))
+    elif kind is Add:
+        return _sum(map(simplify, node.terms))
+    elif kind is Div:
+        numer, denom = simplify(node.numer), simplify(node.denom)
+        n, d = value(numer), value(denom)
+        if n == 0 and d != 0:
+            return ZERO
+        if d is not None and d != 0:
+            return _product((numer, number(1 / d)))
+        return Div(numer, denom)
+    elif kind is Func:
+        return Func(node.name, simplify(node.arg))
+    elif kind is Root:
+        return Root(node.n, simplify(node.arg))
+    raise TypeError(f"not an expression node: {node!r}")
+
+def simplify_stream(expressions):
+    """A generator; yields the simplified tree of each of a stream of trees (or Polynomial, Algebraic
+    or Closeform instances, taken as they are when reached)"""
+    for expression in expressions:
+        yield simplify(expression if isinstance(expression, Node) else expression.tree())
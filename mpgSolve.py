@@ -0,0 +1,263 @@
+# description: the solution engine; symbolic derivatives (and partial derivatives) of generated
+#              expressions, and antiderivatives where a closed form exists. Results are trees of
+#              mpgNodes nodes, memoized per (subexpression, indeterminant), so subterms shared
+#              between problems are only solved once
+
+import functools
+from fractions import Fraction
+
+from mpgNodes import Node, Const, Rational, Var, Pow, Mul, Add, Div, Func, Root, node_cache
+
+CACHE_SIZE = 1 << 16 # (subexpression, indeterminant) results kept by each memo
+
+ZERO, ONE, MINUS_ONE = Const(0), Const(1), Const(-1)
+
+# Building blocks; these fold numbers and drop 0 and 1 so results stay small
+
+def number(value):
+    """Returns the node of a Fraction (or int)"""
+    value = Fraction(value)
+    if value.denominator == 1:
+        return Const(value.numerator)
+    return Rational(value.numerator, value.denominator)
+
+def value(node):
+    """Returns the Fraction of a numeric node, or None"""
+    if type(node) is Const:
+        return Fraction(node.value)
+    elif type(node) is Rational:
+        return Fraction(node.numer, node.denom)
+    return None
+
+def add(*terms):
+    coeff, rest = Fraction(0), []
+    for term in terms:
+        for t in term.terms if type(term) is Add else (term,):
+            v = value(t)
+            if v is None:
+                rest.append(t)
+            else:
+                coeff += v
+    if coeff:
+        rest.append(number(coeff))
+    if not rest:
+        return ZERO
+    return rest[0] if len(rest) == 1 else Add(tuple(rest))
+
+def mul(*factors):
+    coeff, rest = Fraction(1), []
+    for factor in factors:
+        for f in factor.factors if type(factor) is Mul else (factor,):
+            v = value(f)
+            if v is None:
+                rest.append(f)
+            else:
+                coeff *= v
+    if not coeff:
+        return ZERO
+    if coeff != 1 or not rest: # the coefficient leads, as in generated terms
+        rest.insert(0, number(coeff))
+    return rest[0] if len(rest) == 1 else Mul(tuple(rest))
+
+def div(numer, denom):
+    if denom == ONE or numer == ZERO:
+        return numer
+    if value(denom) is not None:
+        return mul(number(1 / value(denom)), numer)
+    return Div(numer, denom)
+
+def power(base, exp):
+    if exp == 0:
+        return ONE
+    if exp == 1:
+        return base
+    return Pow(base, exp)
+
+def neg(node):
+    return mul(MINUS_ONE, node)
+
+def sub(a, b):
+    return add(a, neg(b))
+
+def sqrt(node):
+    return Root(2, node)
+
+@node_cache
+def free_indeterminants(node):
+    """Returns the frozenset of indeterminant names in a tree"""
+    if type(node) is Var:
+        return frozenset((node.name,))
+    return frozenset().union(*map(free_indeterminants, node.children()))
+
+# Derivatives of each function, in terms of its argument u
+
+FUNCTION_DERIVATIVES = {
+    'sin': lambda u : Func('cos', u),
+    'cos': lambda u : neg(Func('sin', u)),
+    'tan': lambda u : power(Func('sec', u), 2),
+    'csc': lambda u : neg(mul(Func('csc', u), Func('cot', u))),
+    'sec': lambda u : mul(Func('sec', u), Func('tan', u)),
+    'cot': lambda u : neg(power(Func('csc', u), 2)),
+    'arcsin': lambda u : div(ONE, sqrt(sub(ONE, power(u, 2)))),
+    'arccos': lambda u : div(MINUS_ONE, sqrt(sub(ONE, power(u, 2)))),
+    'arctan': lambda u : div(ONE, add(ONE, power(u, 2))),
+    # the reciprocal inverses are arcsin(1/u), arccos(1/u) and arctan(1/u), as in mpgEvaluate
+    'arccsc': lambda u : div(MINUS_ONE, mul(power(u, 2), sqrt(sub(ONE, div(ONE, power(u, 2)))))),
+    'arcsec': lambda u : div(ONE, mul(power(u, 2), sqrt(sub(ONE, div(ONE, power(u, 2)))))),
+    'arccot': lambda u : div(MINUS_ONE, add(ONE, power(u, 2))),
+    'sinh': lambda u : Func('cosh', u),
+    'cosh': lambda u : Func('sinh', u),
+    'tanh': lambda u : power(Func('sech', u), 2),
+    'csch': lambda u : neg(mul(Func('csch', u), Func('coth', u))),
+    'sech': lambda u : neg(mul(Func('sech', u), Func('tanh', u))),
+    'coth': lambda u : neg(power(Func('csch', u), 2)),
+    'arcsinh': lambda u : div(ONE, sqrt(add(power(u, 2), ONE))),
+    'arccosh': lambda u : div(ONE, sqrt(sub(power(u, 2), ONE))),
+    'arctanh': lambda u : div(ONE, sub(ONE, power(u, 2))),
+    'arccsch': lambda u : div(MINUS_ONE, mul(power(u, 2), sqrt(add(ONE, div(ONE, power(u, 2)))))),
+    'arcsech': lambda u : div(MINUS_ONE, mul(power(u, 2), sqrt(sub(div(ONE, power(u, 2)), ONE)))),
+    'arccoth': lambda u : div(MINUS_ONE, sub(power(u, 2), ONE)),
+    'ln': lambda u : div(ONE, u),
+    'exp': lambda u : Func('exp', u),
+}
+
+# Antiderivatives of each function of a lone indeterminant x, where a closed form exists
+
+FUNCTION_ANTIDERIVATIVES = {
+    'sin': lambda x : neg(Func('cos', x)),
+    'cos': lambda x : Func('sin', x),
+    'tan': lambda x : neg(Func('ln', Func('cos', x))),
+    'sec': lambda x : Func('ln', add(Func('sec', x), Func('tan', x))),
+    'csc': lambda x : neg(Func('ln', add(Func('csc', x), Func('cot', x)))),
+    'cot': lambda x : Func('ln', Func('sin', x)),
+    'sinh': lambda x : Func('cosh', x),
+    'cosh': lambda x : Func('sinh', x),
+    'tanh': lambda x : Func('ln', Func('cosh', x)),
+    'ln': lambda x : sub(mul(x, Func('ln', x)), x),
+    'exp': lambda x : Func('exp', x),
+}
+
+def _log_base(name):
+    # 'log-b' -> ln(b)
+    return Func('ln', number(Fraction(name[4:])))
+
+def _function_derivative(name, u):
+    if name.startswith('log-'): # log-b(u) = ln(u)/ln(b)
+        return div(ONE, mul(u, _log_base(name)))
+    if name not in FUNCTION_DERIVATIVES:
+        raise ValueError(f"unknown function: {name}")
+    return FUNCTION_DERIVATIVES[name](u)
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _derivative(node, var):
+    if var not in free_indeterminants(node):
+        return ZERO
+    kind = type(node)
+    if kind is Var:
+        return ONE
+    elif kind is Add:
+        return add(*(_derivative(t, var) for t in node.terms))
+    elif kind is Mul: # product rule
+        terms = []
+        for i, f in enumerate(node.factors):
+            df = _derivative(f, var)
+            if df != ZERO:
+                terms.append(mul(*node.factors[:i], df, *node.factors[i+1:]))
+        return add(*terms)
+    elif kind is Div: # quotient rule
+        u, w = node.numer, node.denom
+        return div(sub(mul(_derivative(u, var), w), mul(u, _derivative(w, var))), power(w, 2))
+    elif kind is Pow:
+        return mul(Const(node.exp), power(node.base, node.exp - 1), _derivative(node.base, var))
+    elif kind is Root: # d/dx u**(1/n) = u' / (n * root(u)**(n-1))
+        return div(_derivative(node.arg, var), mul(Const(node.n), power(node, node.n - 1)))
+    elif kind is Func: # chain rule
+        return mul(_function_derivative(node.name, node.arg), _derivative(node.arg, var))
+    raise TypeError(f"not an expression node: {node!r}")
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _antiderivative(node, var):
+    x = Var(var)
+    if var not in free_indeterminants(node):
+        return mul(node, x)
+    kind = type(node)
+    if kind is Var:
+        return mul(number(Fraction(1, 2)), power(x, 2))
+    elif kind is Add:
+        terms = [_antiderivative(t, var) for t in node.terms]
+        return None if None in terms else add(*terms)
+    elif kind is Mul: # only one factor may depend on the indeterminant
+        dependent = [f for f in node.factors if var in free_indeterminants(f)]
+        if len(dependent) > 1:
+            return None
+        integral = _antiderivative(dependent[0], var)
+        if integral is None:
+            return None
+        return mul(*(f for f in node.factors if f is not dependent[0]), integral)
+    elif kind is Div:
+        if var in free_indeterminants(node.denom):
+            return None
+        integral = _antiderivative(node.numer, var)
+        return None if integral is None else div(integral, node.denom)
+    elif kind is Pow:
+        if node.base == x:
+            return mul(number(Fraction(1, node.exp + 1)), power(x, node.exp + 1))
+        if node.exp == 1:
+            return _antiderivative(node.base, var)
+        return None
+    elif kind is Root: # x**(1/n) integrates to n/(n+1) * x * root(x)
+        if node.arg == x:
+            return mul(number(Fraction(node.n, node.n + 1)), x, node)
+        return None
+    elif kind is Func:
+        if node.arg != x:
+            return None
+        if node.name.startswith('log-'):
+            return div(FUNCTION_ANTIDERIVATIVES['ln'](x), _log_base(node.name))
+        integral = FUNCTION_ANTIDERIVATIVES.get(node.name)
+        return None if integral is None else integral(x)
+    return None
+
+def _tree(expression):
+    if isinstance(expression, Node):
+        return expression
+    return expression.tree()
+
+def _indeterminant(expression, node, var):
+    if var is not None:
+        return var
+    if not isinstance(expression, Node):
+        return expression.indets[0]
+    return min(free_indeterminants(node), default='x')
+
+def derivative(expression, var=None):
+    """Returns the derivative of an expression with respect to an indeterminant, as a tree
+
+    @expression: a Polynomial, Algebraic or Closeform instance, or an mpgNodes tree
+    @var: the indeterminant; defaults to the first of the expression's indeterminants"""
+    node = _tree(expression)
+    return _derivative(node, _indeterminant(expression, node, var))
+
+def gradient(expression):
+    """Returns the partial derivatives of an expression, as a dict of indeterminant -> tree"""
+    node = _tree(expression)
+    indets = expression.indets if not isinstance(expression, Node) else sorted(free_indeterminants(node))
+    return {var: _derivative(node, var) for var in indets}
+
+def antiderivative(expression, var=None):
+    """Returns an antiderivative of an expression with respect to an indeterminant (without the
+    constant of integration), or None when no closed form is known
+
+    Integrates term by term: polynomials, functions of a lone indeterminant (sin, cos, tan, csc, sec,
+    cot, sinh, cosh, tanh, ln, log-b and e**), their products with factors free of the indeterminant,
+    and quotients by such factors"""
+    node = _tree(expression)
+    return _antiderivative(node, _indeterminant(expression, node, var))
+
+def cache_info():
+    """Returns the (derivative, antiderivative) memo statistics"""
+    return _derivative.cache_info(), _antiderivative.cache_info()
+
+def clear_cache():
+    _derivative.cache_clear()
+    _antiderivative.cache_clear()
@@ -154,4 +154,5 @@ def get_expon(indeterminant=None, function=False, expression=None):
     return [coeff, 'e**', exponent]
 
 
-print(get_expon(function=True, expression='Polynomial'))
\ No newline at end of file
+if __name__ == '__main__':
+    print(get_expon(function=True, expression='Polynomial'))
\ No newline at end of file
@@ -0,0 +1,5 @@
+# description: makes the package's top-level modules importable from the tests, wherever pytest is run from
+
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,63 @@
+# description: the deduplicating problem bank; canonical forms, the digest table's growth and reopening,
+#              and that banking problems in a loop doesn't keep their trees alive
+
+import gc, random
+
+import mpgExpressions
+import mpgNodes
+from mpgBank import DigestTable, ProblemBank, canonical, digest, unique_problem_generator
+from mpgNodes import Const, Rational, Var, Pow, Mul, Add
+
+def live_nodes():
+    gc.collect()
+    return sum(len(kind._interned) for kind in mpgNodes.Node.__subclasses__())
+
+def test_canonical_ignores_term_order_and_unreduced_fractions():
+    x, y = Var('x'), Var('y')
+    a = Add((Mul((Rational(2, 4), Pow(x, 2))), Mul((Const(3), y)), Const(1)))
+    b = Add((Const(1), Add((Mul((Const(3), y)), Mul((Rational(1, 2), Pow(x, 2)))))))
+    assert canonical(a) is canonical(b)
+    assert digest(a) == digest(b)
+    assert digest(a) != digest(Add((Mul((Const(3), y)), Const(1))))
+
+def test_canonical_is_a_fixed_point():
+    expression = mpgExpressions.Closeform(rng=random.Random(0))
+    for _ in range(200):
+        expression.random()
+        node = canonical(expression.tree())
+        assert canonical(node) is node
+
+def test_table_grows_and_reopens(tmp_path):
+    path = str(tmp_path / 'bank')
+    keys = [bytes([i % 251 + 1]) * 8 + i.to_bytes(8, 'little') for i in range(5000)]
+    with DigestTable(path, capacity=16) as table:
+        assert all(table.add(key) for key in keys)
+        assert not any(table.add(key) for key in keys[:100])
+        assert table.capacity >= len(keys) / 0.7
+    with DigestTable(path) as table:
+        assert len(table) == len(keys)
+        assert all(key in table for key in keys)
+        assert set(table) == set(keys)
+
+def test_bank_is_unique_across_runs(tmp_path):
+    path = str(tmp_path / 'bank')
+    with ProblemBank(path) as bank:
+        first = list(unique_problem_generator(mpgExpressions.Polynomial, 300, bank, randomize=True, seed=1))
+    assert len({str(p) for p in first}) == 300
+    with ProblemBank(path) as bank:
+        assert len(bank) == 300
+        again = list(unique_problem_generator(mpgExpressions.Polynomial, 300, bank, randomize=True, seed=1,
+                                              max_rejections=1000))
+        assert not {str(p) for p in again} & {str(p) for p in first}
+
+def test_banking_in_a_loop_frees_the_trees():
+    bank = ProblemBank()
+    expression = mpgExpressions.Closeform(rng=random.Random(0))
+    counts = []
+    for _ in range(4):
+        for _ in range(2000):
+            expression.random()
+            bank.add(expression)
+        counts.append(live_nodes())
+    assert counts[-1] < counts[0] + 1000, counts
+    assert len(canonical.cache) < 1000
@@ -0,0 +1,32 @@
+# description: vectorized batch coefficients; seeded batches are reproducible, values stay within the
+#              range, the leading coefficient is never 0, and ranges without a denominator are refused
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from mpgBatch import get_coefficients_batch
+
+def test_seeded():
+    a, b = get_coefficients_batch(100, 4, rng=7), get_coefficients_batch(100, 4, rng=np.random.default_rng(7))
+    assert a.shape == (100, 5) and (a == b).all()
+    assert not (a == get_coefficients_batch(100, 4, rng=8)).all()
+
+@pytest.mark.parametrize('lowbound, highbound', [(-10, 10), (1, 20), (-30, -2), (20, -5)])
+def test_within_bounds(lowbound, highbound):
+    out = get_coefficients_batch(2000, 3, lowbound, highbound, rng=0)
+    largest = max(abs(lowbound), abs(highbound))
+    assert ((out['numer'] >= 0) & (out['numer'] <= largest)).all()
+    assert ((out['denom'] >= 1) & (out['denom'] <= largest)).all()
+    assert np.isin(out['sign'], (-1, 1)).all()
+
+def test_leading_coefficient_non_zero():
+    out = get_coefficients_batch(5000, 2, rng=1)
+    assert (out['numer'][:, 0] != 0).all()
+    assert (out['numer'][:, 1:] == 0).any() # the rest may be
+
+@pytest.mark.filterwarnings('ignore:coefficient range too small')
+@pytest.mark.parametrize('lowbound, highbound', [(5, 5), (0, 1)])
+def test_empty_range(lowbound, highbound):
+    with pytest.raises(ValueError):
+        get_coefficients_batch(10, 2, lowbound, highbound, rng=0)
@@ -0,0 +1,49 @@
+# description: the binary format; trees encode and decode back to the same (interned) node, and archives
+#              round-trip problems in order and by index, and can be closed while records are still held
+
+import random
+
+import main, mpgExpressions
+from mpgBinary import Archive, ArchiveWriter, encode, decode, write_archive
+
+def test_encode_round_trip():
+    expression = mpgExpressions.Closeform(rng=random.Random(0))
+    symbols = {}
+    for _ in range(300):
+        expression.random()
+        tree = expression.tree()
+        data = encode(tree, symbols)
+        node, end = decode(data, list(symbols))
+        assert node is tree and end == len(data)
+
+def test_archive_round_trip(tmp_path):
+    path = str(tmp_path / 'problems.mpg')
+    expression = mpgExpressions.Algebraic(rng=random.Random(1))
+    trees = []
+    with ArchiveWriter(path) as writer:
+        for _ in range(200):
+            expression.random()
+            trees.append(expression.tree())
+            writer.add(expression)
+    with Archive(path) as archive:
+        assert len(archive) == 200
+        assert list(archive) == trees
+        assert [archive[i] for i in (199, 0, 57)] == [trees[199], trees[0], trees[57]]
+        assert decode(archive.record(57), archive.symbols)[0] is trees[57]
+
+def test_write_archive_matches_problem_generator(tmp_path):
+    path = str(tmp_path / 'seeded.mpg')
+    assert write_archive(mpgExpressions.Closeform, 50, path, randomize=True, seed=3) == 50
+    expression = mpgExpressions.Closeform()
+    with Archive(path) as archive:
+        assert list(archive) == [main.generate_tree(expression, i, 3, True) for i in range(50)]
+
+def test_close_with_a_record_held(tmp_path):
+    path = str(tmp_path / 'held.mpg')
+    write_archive(mpgExpressions.Polynomial, 10, path, seed=1)
+    archive = Archive(path)
+    record, tree, symbols = archive.record(3), archive[3], archive.symbols
+    archive.close()
+    assert decode(record, symbols)[0] is tree # still readable
+    archive.close() # and closing again is harmless
+    del record
@@ -0,0 +1,38 @@
+# description: difficulty-targeted generation; problems come out near the difficulty asked for, and
+#              configuring only sets attributes random() draws, so an Algebraic's rational and proper stay as set
+
+import random
+
+import pytest
+
+import mpgExpressions
+from mpgDifficulty import difficulty, difficulties, configure
+
+@pytest.mark.parametrize('kind', ['Polynomial', 'Algebraic', 'Closeform'])
+def test_near_target(kind):
+    expression = getattr(mpgExpressions, kind)(rng=random.Random(0))
+    for target in difficulties(kind):
+        levels = []
+        for _ in range(100):
+            expression.random(target)
+            levels.append(difficulty(expression))
+        assert abs(sum(levels) / len(levels) - target) < 1.5, target
+
+@pytest.mark.parametrize('rational, proper', [(True, True), (True, False), (False, True), (False, False)])
+def test_algebraic_form_kept(rational, proper):
+    expression = mpgExpressions.Algebraic(rational=rational, proper=proper, rng=random.Random(1))
+    for target in range(1, 11):
+        configure(expression, target)
+        assert (expression.rational, expression.proper) == (rational, proper)
+    expression.random(5)
+    expression.random()
+    assert (expression.rational, expression.proper) == (rational, proper)
+
+def test_algebraic_model_follows_form():
+    # the table is of the form the expression has; (True, True) has nothing at 1, (False, True) nothing at 10
+    assert 1 not in difficulties('Algebraic', (True, True))
+    assert 10 not in difficulties('Algebraic', (False, True))
+
+def test_bad_target():
+    with pytest.raises(ValueError):
+        configure(mpgExpressions.Polynomial(), 11)
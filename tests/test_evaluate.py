@@ -0,0 +1,44 @@
+# description: the compiled numeric evaluator; backends agree, NumPy is loaded on first use, and
+#              points outside the domain give nan rather than raising, and powers keep their bases whole
+
+import math, os, random, subprocess, sys
+
+import pytest
+
+import mpgExpressions
+from mpgEvaluate import compile_expression, evaluate
+from mpgNodes import Const, Var, Pow, Mul, Func, Root
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_numpy_backend_by_name_in_a_fresh_process():
+    pytest.importorskip('numpy')
+    code = "import mpgExpressions; f = mpgExpressions.Polynomial(2, 'xy').compile('numpy'); print(f([1.0, 2.0], 0.5).shape)"
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == '(2,)'
+
+def test_backends_agree():
+    np = pytest.importorskip('numpy')
+    expression = mpgExpressions.Closeform(rng=random.Random(0))
+    for _ in range(100):
+        expression.random()
+        point = [0.5 + 0.25 * i for i in range(len(expression.indets))]
+        want = compile_expression(expression, backend='math')(*point)
+        got = float(compile_expression(expression, backend='numpy')(*[np.array(p) for p in point]))
+        assert (math.isnan(want) and math.isnan(got)) or math.isclose(want, got, rel_tol=1e-9, abs_tol=1e-12)
+
+def test_outside_the_domain():
+    x = Var('x')
+    assert math.isnan(evaluate(Func('ln', x), 'math', x=-1.0))
+    assert math.isnan(evaluate(Root(2, x), 'math', x=-4.0))
+    assert evaluate(Root(3, x), 'math', x=-8.0) == pytest.approx(-2.0)
+
+@pytest.mark.parametrize('backend', ['math', 'numpy'])
+def test_power_bases(backend):
+    if backend == 'numpy':
+        pytest.importorskip('numpy')
+    x = Var('x')
+    assert float(compile_expression(Pow(Pow(x, 2), 3), 'x', backend)(2.0)) == 64.0
+    assert float(compile_expression(Pow(Const(-3), 2), 'x', backend)(1.0)) == 9.0
+    assert float(compile_expression(Pow(Mul((Const(-1), x)), 3), 'x', backend)(2.0)) == -8.0
@@ -0,0 +1,106 @@
+# description: seeded generation is reproducible; __call__ output is checked against a stored baseline
+#              (tests/data/expressions.json), byte for byte as repr() writes it, and keeps the nested list form
+#              run: PYTHONPATH=. python tests/test_expressions.py to rewrite the baseline after an intended change
+
+import json, os, random
+
+import pytest
+
+import main, mpgExpressions
+from mpgExpressions import coefficient_sampler
+from mpgNodes import Const, Var, Pow, Mul, coefficient_node, tokens
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'expressions.json')
+
+CONFIGURATIONS = {
+    'Polynomial': [{}, {'degree': 4, 'indeterminants': 'xyz'}, {'degree': 2, 'lowbound': -3, 'highbound': 30}],
+    'Algebraic': [{}, {'degree': 3, 'indeterminants': 'xy', 'root': 3}, {'degree': 2, 'rational': False, 'proper': False}],
+    'Closeform': [{}, {'degree': 3, 'trig': True, 'log': True, 'expo': True},
+                  {'degree': 2, 'indeterminants': 'wxyz', 'trig': False, 'algebraic': (2, True, False)}],
+}
+
+def outputs():
+    # the repr of every seeded problem the baseline records, by name
+    results = {}
+    for kind, configurations in CONFIGURATIONS.items():
+        cls = getattr(mpgExpressions, kind)
+        for n, params in enumerate(configurations):
+            expression = cls(rng=random.Random(n), **params)
+            results[f"{kind}/{n}"] = [repr(expression())] + [repr(problem) for problem in
+                                                               main.problem_generator(expression, 10, seed=n)]
+        expression = cls(rng=random.Random(7))
+        results[f"{kind}/random"] = [repr(problem) for problem in main.problem_generator(expression, 30, True, seed=7)]
+        results[f"{kind}/difficulty"] = [repr(problem) for level in range(1, 11) for problem in
+                                         main.problem_generator(expression, 3, seed=level, difficulty=level)]
+    return results
+
+def test_matches_baseline():
+    with open(BASELINE) as file:
+        baseline = json.load(file)
+    results = outputs()
+    assert results.keys() == baseline.keys()
+    for name, problems in results.items():
+        assert problems == baseline[name], name
+
+def test_global_random_untouched():
+    state = random.getstate()
+    expression = mpgExpressions.Closeform(rng=random.Random(1))
+    for _ in range(20):
+        expression.random()
+    assert random.getstate() == state
+
+def test_instances_independent():
+    # interleaving two seeded instances doesn't change what either makes
+    a, b = mpgExpressions.Algebraic(rng=random.Random(3)), mpgExpressions.Algebraic(rng=random.Random(3))
+    alone = []
+    for _ in range(10):
+        a.random()
+        alone.append(a())
+    c = mpgExpressions.Algebraic(rng=random.Random(3))
+    together = []
+    for _ in range(10):
+        b.random()
+        c.random()
+        together.append(b())
+    assert together == alone
+
+@pytest.mark.parametrize('coeff', [['+', 3], ['-', 7], ['+', 0], ['+', 1, '/', 4], ['-', 5, '/', 9]])
+def test_coefficient_tokens(coeff):
+    assert tokens(coefficient_node(coeff)) == coeff
+
+def test_token_form():
+    # the nested list form: a polynomial is a list of (coefficient, [indeterminant, '**', degree, ...])
+    # terms ending in a bare coefficient
+    expression = mpgExpressions.Polynomial(3, 'xy', rng=random.Random(5))
+    for _ in range(50):
+        expression.new()
+        *terms, constant = expression()
+        assert constant[0] in '+-' and len(constant) in (2, 4)
+        for coeff, form in terms:
+            assert coeff[0] in '+-' and len(coeff) in (2, 4)
+            assert all(form[i] in 'xy' and form[i + 1] == '**' and 0 <= form[i + 2] <= 3 for i in range(0, len(form), 3))
+
+@pytest.mark.parametrize('kind', ['Polynomial', 'Algebraic'])
+def test_configured_bounds(kind):
+    # the whole coefficients of polynomial terms are 0, 1 or from [lowbound, highbound); (a Closeform's
+    # function terms have coefficients of their own, from the default range)
+    expression = getattr(mpgExpressions, kind)(degree=3, lowbound=10, highbound=40, rng=random.Random(6))
+    values = set()
+    for _ in range(100):
+        expression.new()
+        values.update(node.factors[0].value for node in expression.tree().walk() if type(node) is Mul
+                      and type(node.factors[0]) is Const and all(type(f) in (Var, Pow) for f in node.factors[1:]))
+    assert values <= {0, 1, *range(10, 40)} and values & set(range(11, 40))
+
+@pytest.mark.parametrize('lowbound, highbound', [(0, 1), (1, 0)])
+def test_range_without_non_zero_values(lowbound, highbound):
+    # denominators are redrawn until non-zero, so these would never finish
+    with pytest.raises(ValueError, match="non-zero"):
+        coefficient_sampler(lowbound, highbound)
+    with pytest.raises(ValueError, match="non-zero"):
+        mpgExpressions.Polynomial(lowbound=lowbound, highbound=highbound, rng=random.Random(0))
+
+if __name__ == '__main__':
+    os.makedirs(os.path.dirname(BASELINE), exist_ok=True)
+    with open(BASELINE, 'w') as file:
+        json.dump(outputs(), file, indent=1)
@@ -0,0 +1,63 @@
+# description: answer checking; right answers pass and wrong ones fail, antiderivatives are accepted up to a
+#              constant, sample points stay inside the domain, and an empty domain is a clear DomainError
+
+import random
+
+import pytest
+
+pytest.importorskip('numpy')
+
+import mpgExpressions
+from mpgGrade import DomainError, check, fingerprint, grade
+from mpgNodes import Const, Var, Pow, Mul, Add, Func, Root
+from mpgSimplify import simplify
+from mpgSolve import antiderivative, derivative
+
+x = Var('x')
+
+def test_value():
+    expression = mpgExpressions.Closeform(rng=random.Random(0))
+    checked = 0
+    for _ in range(40):
+        expression.random()
+        try:
+            fingerprint(expression)
+        except DomainError: # e.g. the root of a negative constant
+            continue
+        checked += 1
+        other = mpgExpressions.Polynomial(2, expression.indets, rng=random.Random(1))
+        assert check(expression, simplify(expression.tree())) # the same value, written differently
+        assert not check(expression, Add((expression.tree(), Const(1))))
+        assert not check(expression, other)
+    assert checked > 30
+
+def test_derivative():
+    expression = mpgExpressions.Polynomial(3, 'xy', rng=random.Random(2))
+    right, wrong = derivative(expression), derivative(expression, 'y')
+    assert list(grade(expression, [right, wrong, right], 'derivative')) == [True, False, True]
+
+def test_antiderivative_up_to_a_constant():
+    expression = mpgExpressions.Polynomial(3, 'xy', rng=random.Random(3))
+    F = antiderivative(expression)
+    assert check(expression, F, 'antiderivative')
+    assert check(expression, Add((F, Const(7), Mul((Const(2), Var('y'))))), 'antiderivative') # constant in x
+    assert not check(expression, Add((F, x)), 'antiderivative')
+    assert not check(expression, Mul((Const(2), F)), 'antiderivative')
+
+@pytest.mark.parametrize('node, inside', [
+    (Func('ln', x), lambda p : p > 0),
+    (Root(2, x), lambda p : p >= 0),
+    (Root(4, Add((Const(1), Mul((Const(-1), x))))), lambda p : p <= 1),
+    (Func('ln', Add((Mul((Const(-1), Pow(x, 2))), Const(4)))), lambda p : abs(p) < 2),
+])
+def test_points_inside_the_domain(node, inside):
+    for task in ('value', 'derivative'):
+        points = fingerprint(node, task).points[0]
+        assert len(points) and all(inside(p) for p in points)
+
+def test_empty_domain():
+    node = Func('ln', Add((Mul((Const(-1), Pow(x, 2))), Const(-1)))) # ln(-x^2 - 1)
+    with pytest.raises(DomainError, match=r"no sample points where ln\("):
+        fingerprint(node)
+    with pytest.raises(DomainError): # and again, from the cache
+        check(node, node)
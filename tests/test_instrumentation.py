@@ -0,0 +1,35 @@
+# description: generator instrumentation; calls are counted only while it's enabled, and a widened coefficient
+#              range is counted at each use of its shared sampler and warned of once, never printed
+
+import random, warnings
+
+import pytest
+
+from mpgExpressions import Polynomial, Closeform, coefficient_sampler, instrumented, instrumentation_stats
+
+def test_counts_calls():
+    with instrumented() as stats:
+        Closeform(degree=2, rng=random.Random(1))
+    assert stats.calls['Closeform.new'] == 1
+    assert instrumentation_stats() is None
+
+def test_widened_range_counted_per_use(capsys):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        coefficient_sampler(3, 4) # made (and cached) before instrumenting
+    with instrumented() as stats:
+        rng = random.Random(2)
+        for _ in range(5):
+            Polynomial(degree=2, lowbound=3, highbound=4, rng=rng)
+    assert stats.events['range_widened'] == 5
+    assert capsys.readouterr().out == '' # warned, not printed
+
+def test_widened_range_warns():
+    coefficient_sampler.cache_clear()
+    with pytest.warns(RuntimeWarning, match="range too small"):
+        sampler = coefficient_sampler(2, 3)
+    assert (sampler.lowbound, sampler.highbound, sampler.widened) == (10, 15, True)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        coefficient_sampler(2, 3) # shared, so only warned once
+        assert not coefficient_sampler(-10, 10).widened
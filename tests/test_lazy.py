@@ -0,0 +1,64 @@
+# description: lazy expressions; a lazy tree is the one an eager expression makes from the seed it recorded,
+#              specs rebuild it exactly (also after pickling), and only lazy expressions have specs
+
+import pickle, random
+
+import pytest
+
+import mpgExpressions
+from mpgExpressions import ExpressionSpec
+
+KINDS = ['Polynomial', 'Algebraic', 'Closeform']
+
+def eager_twin(lazy):
+    # an eager expression of the same attributes, generating from the lazy one's seed
+    spec = lazy.spec()
+    eager = getattr(mpgExpressions, spec.kind)()
+    for name, value in spec.params:
+        setattr(eager, name, value)
+    eager.rng = random.Random(spec.seed)
+    eager.new()
+    return eager
+
+@pytest.mark.parametrize('kind', KINDS)
+def test_same_problem_as_eager(kind):
+    lazy = getattr(mpgExpressions, kind)(degree=3, rng=random.Random(0), lazy=True)
+    for i in range(50):
+        if i % 2:
+            lazy.random()
+        else:
+            lazy.new()
+        assert lazy() == eager_twin(lazy)()
+        assert lazy.tree() is eager_twin(lazy).tree()
+
+@pytest.mark.parametrize('kind', KINDS)
+def test_spec_round_trip(kind):
+    lazy = getattr(mpgExpressions, kind)(rng=random.Random(1), lazy=True)
+    for _ in range(50):
+        lazy.random()
+        spec = lazy.spec()
+        assert spec.kind == kind
+        assert spec.build().tree() is lazy.tree()
+        copied = pickle.loads(pickle.dumps(spec))
+        assert copied == spec and copied.build()() == lazy()
+
+def test_lazy_generates_on_use(monkeypatch):
+    calls = []
+    polynomial_tree = mpgExpressions.polynomial_tree
+    monkeypatch.setattr(mpgExpressions, 'polynomial_tree', lambda *args : calls.append(args) or polynomial_tree(*args))
+    expression = mpgExpressions.Polynomial(2, lazy=True, rng=random.Random(2))
+    expression.new()
+    expression.new()
+    assert not calls
+    expression.tree()
+    expression()
+    assert len(calls) == 1
+
+@pytest.mark.parametrize('kind', KINDS)
+def test_eager_has_no_spec(kind):
+    with pytest.raises(ValueError):
+        getattr(mpgExpressions, kind)(rng=random.Random(3)).spec()
+
+def test_unknown_kind():
+    with pytest.raises(ValueError):
+        ExpressionSpec('Mathematical', (), 0).build()
@@ -0,0 +1,47 @@
+# description: the problem generators; the threaded and parallel generators make the same problems as
+#              problem_generator for a seed, without one the threads' copies don't share an rng, and chunk sizes below 1 are refused
+
+import random
+
+import pytest
+
+import main, mpgExpressions
+
+def flatten(chunks):
+    return [problem for chunk in chunks for problem in chunk]
+
+def test_threaded_matches_problem_generator():
+    expected = list(main.problem_generator(mpgExpressions.Closeform, 300, randomize=True, seed=9))
+    got = main.threaded_problem_generator(mpgExpressions.Closeform, 300, seed=9, threads=4, chunk_size=16, randomize=True)
+    assert flatten(got) == expected
+
+def test_parallel_matches_problem_generator():
+    expected = list(main.problem_generator(mpgExpressions.Algebraic, 100, randomize=True, seed=4))
+    got = main.parallel_problem_generator(mpgExpressions.Algebraic, 100, seed=4, processes=2, chunk_size=25, randomize=True)
+    assert flatten(got) == expected
+
+def test_threaded_unseeded_copies_have_their_own_rng():
+    rng = random.Random(3)
+    expression = mpgExpressions.Polynomial(2, rng=rng)
+    state = rng.getstate()
+    problems = flatten(main.threaded_problem_generator(expression, 200, seed=None, threads=4, chunk_size=10))
+    assert len(problems) == 200
+    assert rng.getstate() == state # the copies drew from rngs of their own, not the shared one
+
+@pytest.mark.parametrize('chunk_size', [0, -1])
+def test_chunk_size_must_be_positive(chunk_size, tmp_path):
+    with pytest.raises(ValueError):
+        next(main.chunked(iter(range(10)), chunk_size))
+    with pytest.raises(ValueError):
+        list(main.problem_generator(mpgExpressions.Polynomial, 10, chunk_size))
+    with pytest.raises(ValueError):
+        main.write_problems(mpgExpressions.Polynomial, 10, str(tmp_path / 'out.jsonl'), chunk_size)
+    assert not (tmp_path / 'out.jsonl').exists()
+    with pytest.raises(SystemExit):
+        main.main(['polynomial', '10', '--chunk-size', str(chunk_size)])
+
+def test_parallel_unseeded_chunks_differ():
+    expression = mpgExpressions.Closeform(rng=random.Random(5))
+    chunks = list(main.parallel_problem_generator(expression, 40, seed=None, processes=2, chunk_size=10, randomize=True))
+    assert len({repr(chunk) for chunk in chunks}) == 4
+    assert len({repr(problem) for chunk in chunks for problem in chunk}) > 30
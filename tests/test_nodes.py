@@ -0,0 +1,42 @@
+# description: nodes are interned and immutable; equal trees are the same object, also across pickling,
+#              and are dropped from the intern tables once nothing holds them
+
+import gc, pickle, random
+
+import pytest
+
+import mpgExpressions
+from mpgNodes import Const, Rational, Var, Pow, Mul, Add, Func, interned_count
+
+def test_interned():
+    x = Var('x')
+    a = Add((Mul((Const(3), Pow(x, 2))), Func('sin', x)))
+    b = Add((Mul((Const(3), Pow(Var('x'), 2))), Func('sin', Var('x'))))
+    assert a is b and hash(a) == hash(b)
+    assert Const(1) is not Rational(1, 1)
+
+def test_pickle_reinterns():
+    tree = mpgExpressions.Closeform(degree=3, rng=random.Random(2)).tree()
+    assert pickle.loads(pickle.dumps(tree)) is tree
+
+def test_immutable():
+    with pytest.raises(AttributeError):
+        Var('x').name = 'y'
+    with pytest.raises(TypeError):
+        Pow(Var('x'))
+
+def test_walk():
+    x = Var('x')
+    node = Add((Mul((Const(2), x)), Const(1)))
+    assert list(node.walk()) == [node, Mul((Const(2), x)), Const(2), x, Const(1)]
+
+def test_released():
+    # past the nodes the shared generation plans keep, generating more doesn't keep more alive
+    expression = mpgExpressions.Closeform(rng=random.Random(4))
+    counts = []
+    for _ in range(3):
+        for _ in range(2000):
+            expression.random()
+        gc.collect()
+        counts.append(interned_count())
+    assert counts[2] < counts[1] * 1.1
@@ -0,0 +1,46 @@
+# description: the problem pool; a seeded pool makes each configuration's problems from (seed, key, index),
+#              evicted configurations carry on where they stopped instead of starting over, and a cold
+#              request generates one problem, not two
+
+import time
+
+import mpgExpressions
+from main import generate_problem, problem_seed
+from mpgPool import ProblemPool, configuration
+
+def test_seeded_sequence():
+    key = configuration('closeform', degree=2)
+    with ProblemPool(threads=0, seed=5) as pool:
+        problems = [pool.get_key(key) for _ in range(10)]
+    expression = mpgExpressions.Closeform(degree=2, lazy=True)
+    assert problems == [generate_problem(expression, i, problem_seed(5, repr(key))) for i in range(10)]
+
+def test_no_repeats_after_eviction():
+    keys = [configuration('closeform', trig=i % 2 == 0, degree=4 + i) for i in range(3)]
+    with ProblemPool(target=16, low_water=8, memory_budget=20000, threads=1, seed=1) as pool:
+        problems = {key: [] for key in keys}
+        for i in range(600):
+            key = keys[i % 3] if i % 50 < 40 else keys[0]
+            problems[key].append(repr(pool.get_key(key)))
+        assert pool.stats()['evictions'] > 0
+    for made in problems.values():
+        assert len(set(made)) == len(made)
+
+def test_cold_request_generates_once(monkeypatch):
+    calls = []
+    polynomial_tree = mpgExpressions.polynomial_tree
+    monkeypatch.setattr(mpgExpressions, 'polynomial_tree', lambda *args : calls.append(args) or polynomial_tree(*args))
+    with ProblemPool(threads=0) as pool:
+        pool.prime('polynomial', degree=3)
+        assert not calls
+        pool.get('polynomial', degree=3)
+        assert len(calls) == 1
+
+def test_warm_requests_hit():
+    with ProblemPool(target=8, low_water=4, threads=1, seed=2) as pool:
+        pool.get('algebraic', degree=2)
+        while len(pool) < 8:
+            time.sleep(0.001)
+        for _ in range(4):
+            pool.get('algebraic', degree=2)
+        assert pool.stats()['hits'] == 4
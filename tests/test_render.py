@@ -0,0 +1,56 @@
+# description: the renderers write the same math as the tree; plain text renderings are read back as
+#              Python and compared with mpgEvaluate at sample points
+
+import math, random, re
+
+import pytest
+
+import mpgExpressions
+from mpgEvaluate import BACKENDS, compile_expression
+from mpgNodes import Const, Var, Pow, Mul, Add, Func
+from mpgRender import render
+
+POINTS = ((0.3, 0.7, 1.3, 2.1), (1.7, 0.4, 0.9, 1.1), (2.5, 1.9, 0.6, 0.2))
+
+def plain_function(text):
+    # compiles a plain text rendering into a Python function of the indeterminants
+    namespace = dict(BACKENDS['math'], e=math.e, sqrt=lambda x : BACKENDS['math']['root'](x, 2))
+    namespace.update({f"root{n}": (lambda n : lambda x : BACKENDS['math']['root'](x, n))(n) for n in range(3, 11)})
+    namespace.update({f"log_{b}": (lambda b : lambda x : math.log(x) / math.log(b))(int(b))
+                      for b in re.findall(r"log_(\d+)", text)})
+    return lambda **values : eval(text.replace('^', '**'), dict(namespace, **values))
+
+def agrees(node, indets):
+    funct, expected = plain_function(render(node, 'plain')), compile_expression(node, indets, 'math')
+    for point in POINTS:
+        values = dict(zip(indets, point))
+        want = expected(**values)
+        try:
+            got = funct(**values)
+        except (ValueError, ZeroDivisionError, OverflowError):
+            continue
+        if isinstance(got, complex) or not (math.isfinite(want) and math.isfinite(got)):
+            continue
+        if not math.isclose(got, want, rel_tol=1e-9, abs_tol=1e-9):
+            return False
+    return True
+
+def test_negative_nested_sum():
+    x = Var('x')
+    node = Add((Add((Mul((Const(5), Pow(x, 2))), Const(1))), Add((Mul((Const(-3), Func('sin', x))), Mul((Const(2), Func('ln', x)))))))
+    assert render(node, 'plain') == "5*x^2 + 1 + (-3*sin(x) + 2*ln(x))"
+    assert render(node, 'latex') == "5x^{2} + 1 + \\left(-3\\sin\\left(x\\right) + 2\\ln\\left(x\\right)\\right)"
+    assert agrees(node, 'x')
+
+@pytest.mark.parametrize('kind', ['Polynomial', 'Algebraic', 'Closeform'])
+def test_render_matches_evaluate(kind):
+    expression = getattr(mpgExpressions, kind)(rng=random.Random(0))
+    for _ in range(300):
+        expression.random()
+        assert agrees(expression.tree(), expression.indets), render(expression, 'plain')
+
+def test_formats():
+    expression = mpgExpressions.Closeform(rng=random.Random(1))
+    expression.random()
+    assert render(expression, 'mathml').startswith('<math')
+    assert render(expression, 'latex') != render(expression, 'plain')
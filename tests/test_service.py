@@ -0,0 +1,97 @@
+# description: the generation service; responses match problem_generator, bad requests and params are answered
+#              with 400 (never left to hang a worker or drop the connection), and generation errors with 500
+
+import asyncio, concurrent.futures, json
+
+import pytest
+
+import main, mpgExpressions
+from mpgService import ProblemService, RequestError, generate_batch
+
+def request(service, method, target, body=None, length=None):
+    # serves one request on a local port; returns (status, header dict, body bytes)
+    # @length: the Content-Length header to send, if not the body's
+    async def run():
+        server = await asyncio.start_server(service.handle, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            data = b'' if body is None else json.dumps(body).encode()
+            writer.write(f"{method} {target} HTTP/1.1\r\nHost: test\r\nContent-Length: {len(data) if length is None else length}\r\n\r\n".encode() + data)
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+            return response
+    head, _, payload = asyncio.run(run()).partition(b'\r\n\r\n')
+    lines = head.decode().split('\r\n')
+    headers = dict(line.lower().split(': ', 1) for line in lines[1:])
+    if headers.get('transfer-encoding') == 'chunked':
+        chunks = b''
+        while True:
+            size, _, payload = payload.partition(b'\r\n')
+            size = int(size, 16)
+            if not size:
+                break
+            chunks, payload = chunks + payload[:size], payload[size + 2:]
+        payload = chunks
+    return int(lines[0].split()[1]), headers, payload
+
+@pytest.fixture
+def service():
+    service = ProblemService(executor=concurrent.futures.ThreadPoolExecutor(4), chunk_size=8)
+    yield service
+    service.close()
+
+def test_matches_problem_generator(service):
+    status, headers, body = request(service, 'POST', '/problems',
+                                    {'expression': 'closeform', 'count': 20, 'seed': 7, 'params': {'degree': 2}})
+    assert status == 200 and headers['x-seed'] == '7'
+    problems = [json.loads(line) for line in body.decode().splitlines()]
+    expected = main.problem_generator(mpgExpressions.Closeform(degree=2), 20, seed=7)
+    assert problems == json.loads(json.dumps(list(expected)))
+
+@pytest.mark.parametrize('params', [
+    {'degree': -1}, {'degree': 11}, {'degree': 1.5}, {'indeterminants': ''}, {'indeterminants': 'x1'},
+    {'indeterminants': 'x' * 9}, {'root': 0}, {'lowbound': 5, 'highbound': 5}, {'highbound': 10**9},
+    {'rational': 'yes'}, {'lowbound': 0, 'highbound': 1},
+])
+def test_bad_params(service, params):
+    status, _, body = request(service, 'POST', '/problems', {'expression': 'algebraic', 'params': params})
+    assert status == 400 and 'error' in json.loads(body)
+
+def test_bad_query_params(service):
+    status, _, _ = request(service, 'GET', '/problems?expression=closeform&indeterminants=&count=3')
+    assert status == 400
+    status, _, _ = request(service, 'GET', '/problems?expression=closeform&algebraic=[0,true,true]')
+    assert status == 400
+
+def test_generation_error(service, monkeypatch):
+    def fail(*args):
+        raise IndexError('broken')
+    monkeypatch.setattr(mpgExpressions.Polynomial, 'new', fail)
+    status, _, body = request(service, 'POST', '/problems', {'expression': 'polynomial', 'params': {'degree': 2}})
+    assert status == 500 and 'IndexError' in json.loads(body)['error']
+    status, _, _ = request(service, 'GET', '/health') # still serving
+    assert status == 200
+
+def test_jobs_dont_share_instances():
+    # a job drawing attributes by difficulty doesn't change those of a later job of the same params
+    job = ('closeform', (('degree', 2),), 3, 0, 10, False, None, 'tokens')
+    before = generate_batch([job])
+    generate_batch([('closeform', (('degree', 2),), 3, 0, 10, False, 9, 'tokens')])
+    assert generate_batch([job]) == before
+
+def test_parse(service):
+    assert service.parse({'expression': 'polynomial', 'seed': 1, 'params': {'degree': 0}})[1] == (('degree', 0),)
+    with pytest.raises(RequestError):
+        service.parse({'expression': 'polynomial', 'params': {'lazy': True}})
+
+def test_bad_difficulty(service):
+    for difficulty in (True, 0, 11, 2.0):
+        status, _, _ = request(service, 'POST', '/problems', {'expression': 'algebraic', 'difficulty': difficulty})
+        assert status == 400, difficulty
+
+def test_bad_content_length(service):
+    for length in ('abc', '-5', '+5', '\u00b2'):
+        status, _, body = request(service, 'POST', '/problems', {'expression': 'algebraic'}, length)
+        assert status == 400 and 'Content-Length' in json.loads(body)['error'], length
@@ -0,0 +1,72 @@
+# description: the simplification pass; the value is unchanged, it's a fixed point, it shrinks the
+#              generated forms it's meant to, simplified problems take the shape of the simplified tree, and
+#              simplifying in a loop doesn't keep trees alive
+
+import gc, math, random
+
+import pytest
+
+import mpgExpressions
+from mpgEvaluate import compile_expression
+from mpgNodes import Const, Rational, Var, Pow, Mul, Add, Func, tokens
+from mpgSimplify import simplify, simplify_stream
+
+POINTS = ((0.3, 0.7, 1.3, 2.1), (1.7, 0.4, 0.9, 1.1))
+
+def test_folds_and_merges():
+    x, y = Var('x'), Var('y')
+    node = Add((Mul((Const(2), Pow(x, 1))), Mul((Rational(3, 6), x, Pow(y, 0))), Const(0),
+                Mul((Const(0), Var('z'))), Rational(-4, 2)))
+    assert simplify(node) is Add((Mul((Rational(5, 2), x)), Const(-2)))
+    assert simplify(Pow(Func('sin', x), 1)) is Func('sin', x)
+    assert simplify(Add((Mul((Const(0), x)),))) is Const(0)
+
+@pytest.mark.parametrize('kind', ['Polynomial', 'Algebraic', 'Closeform'])
+def test_value_unchanged(kind):
+    expression = getattr(mpgExpressions, kind)(rng=random.Random(0))
+    for _ in range(200):
+        expression.random()
+        node, simple = expression.tree(), simplify(expression.tree())
+        assert simplify(simple) is simple
+        before = compile_expression(node, expression.indets, 'math')
+        after = compile_expression(simple, expression.indets, 'math')
+        for point in POINTS:
+            want = before(*point[:len(expression.indets)])
+            if math.isfinite(want):
+                assert after(*point[:len(expression.indets)]) == pytest.approx(want, rel=1e-9, abs=1e-9)
+
+def test_simplify_option():
+    plain = mpgExpressions.Closeform(rng=random.Random(3))
+    simple = mpgExpressions.Closeform(rng=random.Random(3), simplify=True)
+    for _ in range(50):
+        plain.random()
+        simple.random()
+        assert simple.tree() is simplify(plain.tree())
+        simple() # the token form of any simplified shape
+
+def test_token_shape():
+    # simplified problems are the tokens of the simplified tree; a lone term isn't in a list, and **1 is folded
+    x = Var('x')
+    node = Add((Mul((Const(3), Pow(x, 1))), Const(0)))
+    assert tokens(node) == [(['+', 3], ['x', '**', 1]), ['+', 0]]
+    assert tokens(simplify(node)) == (['+', 3], ['x'])
+    assert tokens(simplify(Mul((Const(2), Pow(Func('sin', x), 1))))) == [['+', 2], 'sin', '(', 'x', ')']
+    lone = 0
+    for kind in ('Polynomial', 'Algebraic', 'Closeform'):
+        expression = getattr(mpgExpressions, kind)(degree=1, rng=random.Random(1), simplify=True)
+        for _ in range(100):
+            expression.new()
+            assert expression() == tokens(expression.tree())
+            lone += type(expression()) is not list
+    assert lone
+
+def test_simplifying_in_a_loop_frees_the_trees():
+    expression = mpgExpressions.Closeform(rng=random.Random(0))
+    sizes = []
+    for _ in range(3):
+        trees = (expression.tree() for _ in range(2000) if expression.random() is None)
+        for _ in simplify_stream(trees):
+            pass
+        gc.collect()
+        sizes.append(len(simplify.cache))
+    assert sizes[-1] < sizes[0] + 200, sizes # flat; what's left is held by other tests' bounded caches
@@ -0,0 +1,73 @@
+# description: the solution engine; derivatives agree with finite differences of the expression, and
+#              antiderivatives differentiate back to the expression, at sample points
+
+import math, random
+
+import pytest
+
+import mpgExpressions
+from mpgEvaluate import compile_expression
+from mpgNodes import Const, Var, Pow, Mul, Add
+from mpgSolve import derivative, antiderivative, gradient
+
+STEP = 1e-6
+
+def slope(funct, point, i):
+    # the central difference of funct in coordinate i at point
+    up, down = list(point), list(point)
+    up[i] += STEP
+    down[i] -= STEP
+    return (funct(*up) - funct(*down)) / (2 * STEP)
+
+def close(got, want):
+    return math.isclose(got, want, rel_tol=1e-4, abs_tol=1e-4)
+
+def points(indets, rng, count=5):
+    # points away from 0 and the poles of most terms
+    return [[rng.uniform(0.3, 1.2) for _ in indets] for _ in range(count)]
+
+def finite(*values):
+    return all(math.isfinite(v) and abs(v) < 1e6 for v in values)
+
+@pytest.mark.parametrize('kind', ['Polynomial', 'Algebraic', 'Closeform'])
+def test_derivative_matches_finite_differences(kind):
+    rng = random.Random(0)
+    expression = getattr(mpgExpressions, kind)(rng=random.Random(0))
+    checked = 0
+    for _ in range(100):
+        expression.random()
+        indets = expression.indets
+        funct = compile_expression(expression, indets, 'math')
+        for var, tree in gradient(expression).items():
+            d = compile_expression(tree, indets, 'math')
+            for point in points(indets, rng):
+                want, got = slope(funct, point, indets.index(var)), d(*point)
+                if finite(want, got, funct(*point)):
+                    assert close(got, want), (expression.tree(), var, point)
+                    checked += 1
+    assert checked > 500
+
+@pytest.mark.parametrize('kind', ['Polynomial', 'Closeform'])
+def test_antiderivative_differentiates_back(kind):
+    rng = random.Random(1)
+    expression = getattr(mpgExpressions, kind)(rng=random.Random(1))
+    solved = 0
+    for _ in range(100):
+        expression.random()
+        F = antiderivative(expression)
+        if F is None:
+            continue
+        solved += 1
+        indets = expression.indets
+        f, F = compile_expression(expression, indets, 'math'), compile_expression(F, indets, 'math')
+        for point in points(indets, rng):
+            want, got = f(*point), slope(F, point, 0)
+            if finite(want, got):
+                assert close(got, want), (expression.tree(), point)
+    assert solved > 20
+
+def test_polynomial_rules():
+    x = Var('x')
+    node = Add((Mul((Const(3), Pow(x, 2))), Const(1)))
+    assert compile_expression(derivative(node, 'x'), 'x', 'math')(2.0) == 12.0
+    assert compile_expression(antiderivative(node, 'x'), 'x', 'math')(2.0) == 10.0